@@ -10,37 +10,95 @@ import threading
 import time
 from datetime import datetime
 import csv
-from docx import Document
+import gzip
 import ipaddress
+import shutil
 
-# Импортируем сканер правильно - из модуля scanner импортируем КЛАСС NetworkScanner
-try:
-    # Правильный импорт: из модуля scanner импортируем класс NetworkScanner
-    from scanner import NetworkScanner  # Убедитесь, что в папке scanner есть файл __init__.py
-    scanner = NetworkScanner()  # Создаем экземпляр класса
-    print("✓ Сканер успешно импортирован")
-except ImportError as e:
-    print(f"✗ Ошибка импорта сканера: {e}")
-    print("Проверьте структуру файлов:")
-    print("  - scanner/__init__.py должен существовать")
-    print("  - scanner/scanner.py должен содержать класс NetworkScanner")
-    
-    # Создаем заглушку для сканера
-    class DummyScanner:
-        def __init__(self):
-            self.is_scanning = False
-            self.web_log_callback = None
-            
-        def set_web_log_callback(self, callback):
-            self.web_log_callback = callback
-            
-        def scan_network(self, network):
-            if self.web_log_callback:
-                self.web_log_callback(f"Заглушка: сканирование сети {network}", 'info')
-            print(f"Заглушка: сканирование сети {network}")
-            return []
+# Тяжелые модули (nmap, docx, pandas) импортируются лениво при первом
+# использовании, чтобы воркеры стартовали быстро.
+scanner = None
+scanner_lock = threading.Lock()
+
+
+class DummyScanner:
+    """Заглушка сканера, если модуль scanner недоступен"""
+    def __init__(self):
+        self.is_scanning = False
+        self.web_log_callback = None
+        
+    def set_web_log_callback(self, callback):
+        self.web_log_callback = callback
+        
+    def set_host_callback(self, callback):
+        pass
+        
+    def scan_network(self, network, skip=None):
+        # Сеть не сканируется: пустой результат означал бы, что все ее хосты пропали
+        if self.web_log_callback:
+            self.web_log_callback(f"Заглушка: сеть {network} не сканируется", 'warning')
+        print(f"Заглушка: сеть {network} не сканируется")
+        raise RuntimeError('сканер недоступен, используется заглушка')
+
+
+def get_scanner():
+    """Ленивое создание сканера при первом использовании"""
+    global scanner
+    if scanner is not None:
+        return scanner
     
-    scanner = DummyScanner()
+    with scanner_lock:
+        if scanner is not None:
+            return scanner
+        
+        if app.config['SCAN_ISOLATION'] == 'process':
+            # Сканирование в отдельном процессе: не делит GIL с обработкой запросов
+            from scanner.scan_worker import ScanWorkerProcess
+            scanner = ScanWorkerProcess(scanner_options())
+            print("✓ Сканер запускается в отдельном процессе")
+            return scanner
+        
+        # Импортируем класс NetworkScanner из модуля scanner/scanner.py
+        try:
+            instance = create_scanner(scanner_options())  # Создаем и настраиваем экземпляр
+            print("✓ Сканер успешно импортирован")
+        except ImportError as e:
+            print(f"✗ Ошибка импорта сканера: {e}")
+            print("Проверьте структуру файлов и зависимости:")
+            print("  - scanner/scanner.py должен содержать класс NetworkScanner")
+            print("  - должен быть установлен python-nmap (pip install -r requirements.txt)")
+            
+            # Создаем заглушку для сканера
+            instance = DummyScanner()
+        
+        scanner = instance
+        return scanner
+
+def scanner_options():
+    """Настройки сканера из конфигурации приложения"""
+    return {
+        'discovery_mode': app.config['DISCOVERY_MODE'],
+        'pcap_file': app.config['PASSIVE_PCAP_FILE'],
+        'service_ports': app.config['SERVICE_PORTS'],
+        'os_cache_ttl': app.config['OS_CACHE_TTL'],
+        'pacing_file': app.config['PACING_FILE']
+    }
+
+from scanner.change_detector import ChangeDetector
+from scanner.scan_worker import create_scanner
+from scanner.checkpoint import ScanCheckpoint
+from scanner.collector import AgentCollector, merge_network_results, prune_network_results
+from scanner.importer import import_stream, seed_targets
+from scanner.serialization import EncodedCache, dumps
+
+# Очередь webhook ведется, только если задан адрес доставки: иначе ее некому разбирать
+change_detector = ChangeDetector(
+    webhook_queue_file='results/webhook_queue.jsonl' if os.environ.get('ASDUE_WEBHOOK_URL') else None
+)
+scan_checkpoint = ScanCheckpoint()
+agent_collector = AgentCollector()
+# Общий список результатов меняют и локальное сканирование, и агенты
+results_lock = threading.Lock()
+encoded_cache = EncodedCache()
 
 app = Flask(__name__)
 
@@ -50,6 +108,40 @@ for folder in ['uploads', 'results', 'logs', 'static', 'templates']:
 
 # Конфигурация
 app.config['NETWORKS_FILE'] = 'networks.json'
+# Известные хосты (seed), сканируемые напрямую без обхода всей сети
+app.config['SEEDS_FILE'] = 'seeds.json'
+# Режим обнаружения хостов: active / passive / hybrid
+app.config['DISCOVERY_MODE'] = os.environ.get('ASDUE_DISCOVERY_MODE', 'active')
+# pcap-файл для офлайн пассивного обнаружения (необязательно)
+app.config['PASSIVE_PCAP_FILE'] = os.environ.get('ASDUE_PASSIVE_PCAP')
+# Пределы темпа опроса по сетям: {"default": {...}, "networks": {"cidr": {"max_rate": ...}}}
+app.config['PACING_FILE'] = os.environ.get('ASDUE_PACING_FILE', 'pacing.json')
+# Время жизни записей кэша ОС (по MAC и набору портов), секунды
+app.config['OS_CACHE_TTL'] = int(os.environ.get('ASDUE_OS_CACHE_TTL', 7 * 24 * 3600))
+# Порты для опроса сервисов, через запятую (пусто - список по умолчанию)
+app.config['SERVICE_PORTS'] = [
+    int(port) for port in os.environ.get('ASDUE_SERVICE_PORTS', '').split(',') if port.strip().isdigit()
+]
+# Где выполняется сканирование: thread - поток веб-процесса, process - отдельный процесс
+app.config['SCAN_ISOLATION'] = os.environ.get('ASDUE_SCAN_ISOLATION', 'thread')
+# Общий токен агентов сканирования (пустой - проверка отключена)
+app.config['AGENT_TOKEN'] = os.environ.get('ASDUE_AGENT_TOKEN', '')
+# Хосты, полученные от агентов (восстанавливаются после перезапуска)
+app.config['AGENT_RESULTS_FILE'] = os.path.join('results', 'agent_results.json')
+# Адрес, на который POST-запросами доставляются события изменений (пусто - доставка отключена)
+app.config['WEBHOOK_URL'] = os.environ.get('ASDUE_WEBHOOK_URL', '')
+# Период доставки событий webhook, секунды
+app.config['WEBHOOK_INTERVAL'] = int(os.environ.get('ASDUE_WEBHOOK_INTERVAL', 30))
+
+# Состояние фоновой проверки готовности сканера (отображается в /health)
+scanner_health = {
+    'status': 'pending',  # pending / checking / ready / degraded
+    'nmap_available': None,
+    'test_hosts': None,
+    'error': None,
+    'checked_at': None
+}
+scanner_health_lock = threading.Lock()
 
 # Глобальные переменные для статуса сканирования
 scan_data = {
@@ -63,9 +155,17 @@ scan_data = {
     'start_time': None,
     'end_time': None,
     'scan_thread': None,  # Этот объект не будет сериализован в JSON
-    'logs': []
+    'logs': [],
+    'log_seq': 0,  # Счетчик записей логов (для версии состояния)
+    'results_version': 0  # Счетчик замен списка результатов (для кэша закодированных результатов)
 }
 
+def set_results(results):
+    """Замена списка результатов (вызывается под results_lock)"""
+    scan_data['results'] = results
+    scan_data['hosts_found'] = len(results)
+    scan_data['results_version'] += 1
+
 @app.route('/')
 def index():
     """Главная страница АСДУЕ"""
@@ -92,6 +192,7 @@ def index():
 @app.route('/networks', methods=['GET', 'POST'])
 def networks():
     """Управление сетями для сканирования"""
+    import_report = None
     
     if request.method == 'POST':
         action = request.form.get('action', '')
@@ -118,15 +219,33 @@ def networks():
         elif 'network_file' in request.files:
             file = request.files['network_file']
             if file.filename:
-                content = file.read().decode('utf-8')
-                new_networks = [line.strip() for line in content.split('\n') if line.strip()]
-                networks_list = load_networks()
-                networks_list.extend(new_networks)
-                networks_list = list(set(networks_list))
-                save_networks(networks_list)
+                import_report = import_network_file(file)
     
     networks_list = load_networks()
-    return render_template('networks.html', networks=networks_list)
+    return render_template('networks.html', networks=networks_list,
+                           seeds_count=len(load_seeds()), import_report=import_report)
+
+@app.route('/api/networks/import', methods=['POST'])
+def import_networks_api():
+    """API потокового импорта сетей и seed-хостов из файла (txt, csv, jsonl, gz)"""
+    file = request.files.get('network_file')
+    if file is None or not file.filename:
+        return jsonify({'status': 'error', 'message': 'Файл не передан'}), 400
+    
+    report = import_network_file(file)
+    return jsonify({'status': 'success', 'report': report})
+
+def import_network_file(file):
+    """Импорт загруженного файла и сохранение сетей и seed-хостов"""
+    networks_list, seeds, report = import_stream(file.stream, file.filename, load_networks(), load_seeds())
+    if report['networks_added']:
+        save_networks(networks_list)
+    if report['seeds_added']:
+        save_seeds(seeds)
+    
+    print(f"Импорт {file.filename}: сетей +{report['networks_added']}, "
+          f"хостов +{report['seeds_added']}, ошибок {report['errors_count']}")
+    return report
 
 @app.route('/scan', methods=['GET', 'POST'])
 def scan_page():
@@ -152,23 +271,55 @@ def scan_page():
                          is_scanning=scan_data['is_scanning'],
                          scan_data=scan_data)
 
+def scan_state_version():
+    """Версия состояния сканирования без результатов и логов (они кэшируются отдельно)"""
+    return (
+        scan_data['is_scanning'],
+        scan_data['progress'],
+        scan_data['current_network'],
+        scan_data['total_networks'],
+        scan_data['scanned_networks'],
+        scan_data['hosts_found'],
+        scan_data['start_time'],
+        scan_data['end_time']
+    )
+
+def encoded_results():
+    """Закодированный список результатов: кодируется заново только при замене списка"""
+    return encoded_cache.get('results', scan_data['results_version'], lambda: scan_data['results'])
+
+def encoded_logs():
+    """Закодированный список логов"""
+    version = (id(scan_data['logs']), scan_data['log_seq'])
+    return encoded_cache.get('logs', version, lambda: scan_data['logs'])
+
+def cached_json_response(encoded):
+    """JSON-ответ из закодированных данных с ETag (304 при совпадении If-None-Match)"""
+    body, etag = encoded
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @app.route('/api/scan/status')
 def scan_status():
     """API для получения статуса сканирования"""
     # Создаем копию данных без несериализуемых объектов
-    serializable_data = {
-        'is_scanning': scan_data['is_scanning'],
-        'progress': scan_data['progress'],
-        'current_network': scan_data['current_network'],
-        'total_networks': scan_data['total_networks'],
-        'scanned_networks': scan_data['scanned_networks'],
-        'hosts_found': scan_data['hosts_found'],
-        'results': scan_data['results'],
-        'start_time': scan_data['start_time'],
-        'end_time': scan_data['end_time'],
-        'logs': scan_data['logs']
-    }
-    return jsonify(serializable_data)
+    def build():
+        return {
+            'is_scanning': scan_data['is_scanning'],
+            'progress': scan_data['progress'],
+            'current_network': scan_data['current_network'],
+            'total_networks': scan_data['total_networks'],
+            'scanned_networks': scan_data['scanned_networks'],
+            'hosts_found': scan_data['hosts_found'],
+            'start_time': scan_data['start_time'],
+            'end_time': scan_data['end_time']
+        }
+    # Строка лога меняет только небольшую часть ответа: результаты берутся уже закодированными
+    state = encoded_cache.get('status', scan_state_version(), build)
+    return cached_json_response(encoded_cache.extend(
+        'status_response', state, [('results', encoded_results()), ('logs', encoded_logs())]
+    ))
 
 @app.route('/api/scan/start', methods=['POST'])
 def api_start_scan():
@@ -187,6 +338,26 @@ def api_start_scan():
     
     return jsonify({'status': 'success', 'message': 'Сканирование запущено'})
 
+@app.route('/api/scan/resume', methods=['POST'])
+def api_resume_scan():
+    """API для продолжения сканирования с последней контрольной точки"""
+    if scan_data['is_scanning']:
+        return jsonify({'status': 'error', 'message': 'Сканирование уже выполняется'})
+    
+    if scan_checkpoint.summary() is None:
+        return jsonify({'status': 'error', 'message': 'Нет незавершенного сканирования'})
+    
+    scan_thread = threading.Thread(target=start_scanning, kwargs={'resume': True}, daemon=True)
+    scan_thread.start()
+    scan_data['scan_thread'] = scan_thread
+    
+    return jsonify({'status': 'success', 'message': 'Сканирование продолжено с контрольной точки'})
+
+@app.route('/api/scan/checkpoint', methods=['GET'])
+def api_scan_checkpoint():
+    """API для получения информации о незавершенном сканировании"""
+    return jsonify({'checkpoint': scan_checkpoint.summary()})
+
 @app.route('/api/scan/stop', methods=['POST'])
 def api_stop_scan():
     """API для остановки сканирования"""
@@ -230,10 +401,143 @@ def list_networks_api():
     networks = load_networks()
     return jsonify({'networks': networks})
 
+@app.route('/api/scan/pacing', methods=['GET'])
+def get_scan_pacing():
+    """API для получения текущего темпа опроса по сетям"""
+    if not hasattr(scanner, 'pacer'):
+        return jsonify({'pacing': {}})
+    return jsonify({'pacing': scanner.pacer.stats()})
+
+@app.route('/api/scan/os-cache', methods=['GET'])
+def get_os_cache_stats():
+    """API для получения статистики кэша определения ОС"""
+    cache = getattr(scanner, 'fingerprint_cache', None)
+    return jsonify({'os_cache': cache.stats() if cache is not None else None})
+
 @app.route('/api/scan/logs', methods=['GET'])
 def get_scan_logs():
     """API для получения логов сканирования"""
-    return jsonify({'logs': scan_data.get('logs', [])})
+    return cached_json_response(encoded_cache.extend('logs_response', None, [('logs', encoded_logs())]))
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """API для получения последних событий изменений в сети"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'events': change_detector.read_events(limit)})
+
+def check_agent_token():
+    """Проверка токена агента, если он задан в конфигурации"""
+    token = app.config['AGENT_TOKEN']
+    return not token or request.headers.get('X-Agent-Token') == token
+
+@app.route('/api/agents/register', methods=['POST'])
+def api_agent_register():
+    """API регистрации агента сканирования"""
+    if not check_agent_token():
+        return jsonify({'status': 'error', 'message': 'Неверный токен агента'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    agent_id = data.get('agent_id', '').strip()
+    if not agent_id:
+        return jsonify({'status': 'error', 'message': 'Не указан agent_id'}), 400
+    
+    try:
+        agent_collector.register(agent_id, data.get('segments', []))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Некорректный сегмент: {e}'}), 400
+    
+    add_scan_log(f"Агент {agent_id} зарегистрирован", 'info')
+    return jsonify({'status': 'success'})
+
+@app.route('/api/agents/work', methods=['GET'])
+def api_agent_work():
+    """API выдачи задания агенту"""
+    if not check_agent_token():
+        return jsonify({'status': 'error', 'message': 'Неверный токен агента'}), 403
+    
+    try:
+        assignment = agent_collector.next_assignment(request.args.get('agent_id', ''))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Агент не зарегистрирован'}), 404
+    
+    if assignment:
+        add_scan_log(f"Сеть {assignment['network']} выдана агенту {request.args.get('agent_id')}", 'info')
+    return jsonify({'status': 'success', 'assignment': assignment})
+
+@app.route('/api/agents/results', methods=['POST'])
+def api_agent_results():
+    """API приема пакета результатов от агента (тело может быть сжато gzip)"""
+    if not check_agent_token():
+        return jsonify({'status': 'error', 'message': 'Неверный токен агента'}), 403
+    
+    try:
+        body = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)
+    except (OSError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Некорректный пакет: {e}'}), 400
+    
+    agent_id = data.get('agent_id', '')
+    final = data.get('final', False)
+    try:
+        network, hosts, received_ips = agent_collector.accept_batch(
+            agent_id, data.get('assignment_id', ''), data.get('hosts', []), final
+        )
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Задание не найдено или выдано другому агенту'}), 409
+    
+    with results_lock:
+        results = merge_network_results(scan_data['results'], network, hosts)
+        if final:
+            # Сеть просканирована целиком: хосты, не пришедшие ни в одном пакете, удаляются
+            results = prune_network_results(results, network, received_ips)
+        set_results(results)
+        # Каждый пакет сразу сохраняется на диск
+        save_agent_results(scan_data['results'])
+        network_hosts = hosts_in_network(scan_data['results'], network) if final else None
+    
+    add_scan_log(f"Агент {agent_id}: получено {len(hosts)} хостов сети {network}", 'success')
+    
+    if final:
+        # Задание выполнено: итог сети сохраняется и сравнивается с инвентарем
+        add_scan_log(f"Агент {agent_id} завершил сеть {network}: {len(network_hosts)} хостов", 'success')
+        if network_hosts:
+            save_results_to_file(network_hosts, prefix=f"agent_{network.replace('/', '_')}")
+        detect_changes(network_hosts, [network])
+    return jsonify({'status': 'success', 'accepted': len(hosts)})
+
+@app.route('/api/agents/release', methods=['POST'])
+def api_agent_release():
+    """API возврата задания, которое агент не смог выполнить, в очередь"""
+    if not check_agent_token():
+        return jsonify({'status': 'error', 'message': 'Неверный токен агента'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    agent_id = data.get('agent_id', '')
+    try:
+        network = agent_collector.release(agent_id, data.get('assignment_id', ''))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Задание не найдено или выдано другому агенту'}), 409
+    
+    add_scan_log(f"Агент {agent_id} не выполнил сеть {network}: {data.get('error', '')}, "
+                 f"сеть возвращена в очередь", 'warning')
+    return jsonify({'status': 'success'})
+
+@app.route('/api/agents/dispatch', methods=['POST'])
+def api_agent_dispatch():
+    """API постановки сетей в очередь агентов (по умолчанию - все сети)"""
+    data = request.get_json(silent=True) or {}
+    networks_list = data.get('networks') or load_networks()
+    networks_list = [network for network in networks_list if validate_network(network)]
+    added = agent_collector.enqueue(networks_list)
+    add_scan_log(f"В очередь агентов поставлено сетей: {added}", 'info')
+    return jsonify({'status': 'success', 'queued': added})
+
+@app.route('/api/agents/status', methods=['GET'])
+def api_agent_status():
+    """API состояния агентов и очереди заданий"""
+    return jsonify(agent_collector.status())
 
 @app.route('/results')
 def results():
@@ -273,6 +577,8 @@ def export_docx():
     filename = f"scan_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
     filepath = os.path.join('results', filename)
     
+    from docx import Document
+    
     doc = Document()
     
     # Заголовок
@@ -339,15 +645,87 @@ def stats():
 @app.route('/health')
 def health():
     """Проверка здоровья сервиса"""
+    # Проверка сканера выполняется в фоне и не задерживает ответ
+    start_readiness_probe()
     return jsonify({
         'status': 'healthy',
         'service': 'network-audit-asdue',
         'version': '1.0.0',
         'timestamp': datetime.now().isoformat(),
         'scanning': scan_data['is_scanning'],
-        'hosts_in_memory': len(scan_data['results'])
+        'hosts_in_memory': len(scan_data['results']),
+        'scanner': dict(scanner_health)
     })
 
+def start_readiness_probe():
+    """Запуск фоновой проверки сканера (однократно)"""
+    with scanner_health_lock:
+        if scanner_health['status'] != 'pending':
+            return
+        scanner_health['status'] = 'checking'
+    
+    probe_thread = threading.Thread(target=run_readiness_probe, daemon=True)
+    probe_thread.start()
+
+webhook_thread = None
+
+def start_webhook_delivery():
+    """Запуск фоновой доставки событий изменений на WEBHOOK_URL (однократно)"""
+    global webhook_thread
+    if not app.config['WEBHOOK_URL'] or webhook_thread is not None:
+        return
+    webhook_thread = threading.Thread(target=run_webhook_delivery, daemon=True)
+    webhook_thread.start()
+
+def run_webhook_delivery():
+    """Периодическая отправка очереди webhook; недоставленные события остаются в очереди"""
+    while True:
+        try:
+            delivered = change_detector.deliver_webhook(app.config['WEBHOOK_URL'])
+            if delivered:
+                print(f"Доставлено событий webhook: {delivered}")
+        except Exception as e:
+            print(f"Ошибка доставки webhook: {e}")
+        time.sleep(app.config['WEBHOOK_INTERVAL'])
+
+def run_readiness_probe():
+    """Проверка доступности nmap и тестовое сканирование localhost
+
+    Тестовое сканирование выполняется отдельным экземпляром NetworkScanner
+    в веб-процессе, поэтому не мешает идущему сканированию. Статус ready
+    выставляется, только если работает настоящий сканер: заглушка
+    DummyScanner, отсутствие python-nmap или бинарного файла nmap дают
+    degraded.
+    """
+    problems = []
+    try:
+        import nmap  # noqa: F401
+    except ImportError:
+        problems.append('модуль python-nmap не установлен')
+    if shutil.which('nmap') is None:
+        problems.append('бинарный файл nmap не найден в PATH')
+    scanner_health['nmap_available'] = not problems
+    
+    try:
+        if isinstance(get_scanner(), DummyScanner):
+            problems.append('сканер недоступен, используется заглушка')
+        else:
+            # Отдельный экземпляр: общий сканер может в это время сканировать сеть,
+            # а scan_network меняет его current_network, nm и прогресс
+            probe_scanner = create_scanner(scanner_options())
+            # Кэш ОС пишет на диск только основной сканер
+            probe_scanner.fingerprint_cache = None
+            test_result = probe_scanner.scan_network("127.0.0.1/32")
+            scanner_health['test_hosts'] = len(test_result)
+    except Exception as e:
+        problems.append(str(e))
+    
+    scanner_health['error'] = '; '.join(problems) or None
+    scanner_health['status'] = 'degraded' if problems else 'ready'
+    
+    scanner_health['checked_at'] = datetime.now().isoformat()
+    print(f"Проверка сканера: {scanner_health['status']}")
+
 def load_networks():
     """Загрузка списка сетей"""
     networks_file = app.config['NETWORKS_FILE']
@@ -364,6 +742,56 @@ def save_networks(networks):
     with open(app.config['NETWORKS_FILE'], 'w') as f:
         json.dump(networks, f, indent=2)
 
+def load_seeds():
+    """Загрузка списка известных хостов"""
+    seeds_file = app.config['SEEDS_FILE']
+    if os.path.exists(seeds_file):
+        try:
+            with open(seeds_file, 'r') as f:
+                return json.load(f)
+        except:
+            return []
+    return []
+
+def save_seeds(seeds):
+    """Сохранение списка известных хостов"""
+    with open(app.config['SEEDS_FILE'], 'w') as f:
+        json.dump(seeds, f, indent=2)
+
+def load_agent_results():
+    """Загрузка сохраненных хостов, полученных от агентов"""
+    results_file = app.config['AGENT_RESULTS_FILE']
+    if os.path.exists(results_file):
+        try:
+            with open(results_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+    return []
+
+def save_agent_results(results):
+    """Атомарное сохранение хостов агентов из общего списка результатов"""
+    results_file = app.config['AGENT_RESULTS_FILE']
+    tmp_file = results_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(dumps([host for host in results if host.get('agent_id')]))
+        os.replace(tmp_file, results_file)
+    except OSError as e:
+        print(f"Ошибка сохранения результатов агентов: {e}")
+
+def hosts_in_network(results, network):
+    """Хосты списка результатов, входящие в сеть"""
+    target = ipaddress.ip_network(network, strict=False)
+    found = []
+    for host in results:
+        try:
+            if ipaddress.ip_address(host.get('ip', '')) in target:
+                found.append(host)
+        except ValueError:
+            continue
+    return found
+
 def validate_network(network_str):
     """Проверка корректности формата сети CIDR"""
     try:
@@ -381,32 +809,62 @@ def add_scan_log(message, log_type='info'):
         'type': log_type
     }
     scan_data['logs'].append(log_entry)
+    scan_data['log_seq'] += 1
     
     # Ограничиваем количество логов (последние 100)
     if len(scan_data['logs']) > 100:
         scan_data['logs'] = scan_data['logs'][-100:]
 
-def start_scanning():
-    """Функция запуска сканирования (работает в отдельном потоке)"""
+def start_scanning(resume=False):
+    """Функция запуска сканирования (работает в отдельном потоке)
+
+    При resume=True сканирование продолжается с последней контрольной точки:
+    уже просканированные сети пропускаются, их хосты восстанавливаются.
+    """
     global scan_data
     
     # Настраиваем callback для логов сканера
     def scanner_web_log(message, level='info'):
         add_scan_log(f"[SCANNER] {message}", level)
     
+    # Каждый собранный хост сразу пишется в контрольную точку
+    def scanner_host_done(network, host):
+        if scan_data['is_scanning'] and network == scan_data['current_network']:
+            scan_checkpoint.host_done(network, host)
+    
+    scanner = get_scanner()
     scanner.set_web_log_callback(scanner_web_log)
+    scanner.set_host_callback(scanner_host_done)
     
     # Сброс предыдущих данных
     scan_data['is_scanning'] = True
     scan_data['progress'] = 0
-    scan_data['results'] = []
+    with results_lock:
+        # Хосты от агентов остаются, пока локальное сканирование не перепишет их сети
+        set_results([host for host in scan_data['results'] if host.get('agent_id')])
     scan_data['current_network'] = ''
     scan_data['start_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     scan_data['end_time'] = None
-    scan_data['hosts_found'] = 0
     scan_data['logs'] = []
     
-    networks_list = load_networks()
+    checkpoint_state = scan_checkpoint.load() if resume else None
+    if checkpoint_state:
+        networks_list = checkpoint_state['networks']
+        scan_data['start_time'] = checkpoint_state['start_time']
+        partial_hosts = checkpoint_state['partial']
+        add_scan_log(f"Продолжаем сканирование с контрольной точки: "
+                     f"{len(checkpoint_state['completed_networks'])}/{len(networks_list)} сетей уже просканировано, "
+                     f"хостов незавершенных сетей: {sum(len(h) for h in partial_hosts.values())}", 'info')
+    else:
+        if resume:
+            add_scan_log('Контрольная точка не найдена, начинаем сканирование заново', 'warning')
+        partial_hosts = {}
+        networks_list = load_networks()
+        # Известные хосты вне заданных сетей сканируются напрямую
+        seeds_list = seed_targets(load_seeds(), networks_list)
+        if seeds_list:
+            add_scan_log(f'Дополнительно целей из известных хостов: {len(seeds_list)}', 'info')
+        networks_list = networks_list + seeds_list
     scan_data['total_networks'] = len(networks_list)
     scan_data['scanned_networks'] = 0
     
@@ -423,14 +881,31 @@ def start_scanning():
     print(f"Начинаем сканирование {len(networks_list)} сетей...")
     
     # Сканируем каждую сеть
-    all_results = []
+    if checkpoint_state:
+        all_results = list(checkpoint_state['results'])
+        completed_networks = list(checkpoint_state['completed_networks'])
+        with results_lock:
+            for network in completed_networks:
+                set_results(merge_network_results(
+                    scan_data['results'], network, hosts_in_network(all_results, network), replace_network=True
+                ))
+    else:
+        all_results = []
+        completed_networks = []
+        scan_checkpoint.begin(networks_list, scan_data['start_time'])
+    interrupted = False
     
     for i, network in enumerate(networks_list):
         if not scan_data['is_scanning']:
             add_scan_log('Сканирование прервано пользователем', 'warning')
             print("Сканирование прервано пользователем")
+            interrupted = True
             break
         
+        if network in completed_networks:
+            scan_data['scanned_networks'] = i + 1
+            continue
+        
         scan_data['current_network'] = network
         scan_data['scanned_networks'] = i + 1
         scan_data['progress'] = int((i + 1) / len(networks_list) * 100)
@@ -440,13 +915,25 @@ def start_scanning():
         print(log_msg)
         
         try:
-            # Используем наш сканер
+            scan_checkpoint.set_cursor(i, network)
+            
+            # Используем наш сканер; хосты, собранные до сбоя, не опрашиваются повторно
             scanner.is_scanning = True
-            network_results = scanner.scan_network(network)
+            done_hosts = partial_hosts.get(network, [])
+            if done_hosts:
+                network_results = done_hosts + scanner.scan_network(
+                    network, skip=[host['ip'] for host in done_hosts]
+                )
+            else:
+                network_results = scanner.scan_network(network)
             
             all_results.extend(network_results)
-            scan_data['results'] = all_results
-            scan_data['hosts_found'] = len(all_results)
+            completed_networks.append(network)
+            scan_checkpoint.network_done(i, network, network_results)
+            with results_lock:
+                set_results(merge_network_results(
+                    scan_data['results'], network, network_results, replace_network=True
+                ))
             
             add_scan_log(f"Найдено устройств в сети {network}: {len(network_results)}", 'success')
             add_scan_log(f"Всего найдено: {len(all_results)} устройств", 'info')
@@ -458,15 +945,34 @@ def start_scanning():
             error_msg = f"Ошибка при сканировании сети {network}: {e}"
             add_scan_log(error_msg, 'error')
             print(error_msg)
-        
-        # Небольшая пауза между сетями
-        time.sleep(1)
+
+            # Сеть просканирована не полностью (ScanError): найденные хосты показываются,
+            # но сеть не считается завершенной и не сравнивается с инвентарем
+            partial_results = partial_hosts.get(network, []) + getattr(e, 'hosts', [])
+            if partial_results:
+                all_results.extend(partial_results)
+                with results_lock:
+                    set_results(merge_network_results(
+                        scan_data['results'], network, partial_results, replace_network=False
+                    ))
+                add_scan_log(f"Сеть {network} просканирована не полностью, найдено устройств: "
+                             f"{len(partial_results)}", 'warning')
+
+        # Пауза между сетями по текущему темпу опроса
+        if hasattr(scanner, 'pacer'):
+            time.sleep(scanner.pacer.inter_network_delay(network))
+        else:
+            time.sleep(1)
     
     # Завершение сканирования
     scan_data['is_scanning'] = False
     scan_data['end_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     scan_data['progress'] = 100
     
+    # Прерванное пользователем сканирование можно продолжить позже
+    if not interrupted:
+        scan_checkpoint.finish(scan_data['end_time'])
+    
     completion_msg = f"Сканирование завершено! Найдено устройств: {len(all_results)}"
     add_scan_log(completion_msg, 'success')
     print(completion_msg)
@@ -474,19 +980,40 @@ def start_scanning():
     # Сохраняем результаты в файл
     if all_results:
         save_results_to_file(all_results)
+    
+    # Хосты агентов, перезаписанные локальным сканированием, убираются и с диска
+    with results_lock:
+        save_agent_results(scan_data['results'])
+    
+    # Сравниваем с предыдущим инвентарем и публикуем события изменений
+    detect_changes(all_results, completed_networks)
+
+def detect_changes(results, scanned_networks):
+    """Обнаружение изменений относительно предыдущего инвентаря"""
+    try:
+        events = change_detector.process(results, scanned_networks)
+        if events:
+            add_scan_log(f"Обнаружено изменений в сети: {len(events)}", 'warning')
+        else:
+            add_scan_log('Изменений в сети не обнаружено', 'info')
+        print(f"Событий изменений: {len(events)}")
+    except Exception as e:
+        error_msg = f"Ошибка обнаружения изменений: {e}"
+        add_scan_log(error_msg, 'error')
+        print(error_msg)
 
-def save_results_to_file(results):
+def save_results_to_file(results, prefix='scan'):
     """Сохранение результатов в JSON файл"""
-    filename = f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     filepath = os.path.join('results', filename)
     
     try:
-        with open(filepath, 'w') as f:
-            json.dump({
+        with open(filepath, 'wb') as f:
+            f.write(dumps({
                 'scan_time': datetime.now().isoformat(),
                 'total_hosts': len(results),
                 'hosts': results
-            }, f, indent=2, default=str)
+            }))
         
         add_scan_log(f"Результаты сохранены в {filepath}", 'info')
         print(f"Результаты сохранены в {filepath}")
@@ -495,6 +1022,26 @@ def save_results_to_file(results):
         add_scan_log(error_msg, 'error')
         print(f"Ошибка сохранения результатов: {e}")
 
+# Хосты от агентов, принятые до перезапуска приложения
+set_results(load_agent_results())
+
+def create_app(config=None):
+    """WSGI-фабрика для production-запуска: gunicorn -c gunicorn.conf.py "app:create_app()"
+
+    Сканирование по умолчанию выносится в отдельный процесс; состояние
+    сканирования хранится в памяти, поэтому HTTP обслуживается одним
+    процессом gunicorn с пулом потоков (см. gunicorn.conf.py).
+    """
+    if 'ASDUE_SCAN_ISOLATION' not in os.environ:
+        app.config['SCAN_ISOLATION'] = 'process'
+    if config:
+        app.config.update(config)
+    
+    # Проверка сканера в фоне, воркер начинает принимать запросы сразу
+    start_readiness_probe()
+    start_webhook_delivery()
+    return app
+
 if __name__ == '__main__':
     # Создаем networks.json если его нет
     if not os.path.exists('networks.json'):
@@ -509,19 +1056,13 @@ if __name__ == '__main__':
     print("Проверьте настройки:")
     print(f"  - networks.json содержит {len(load_networks())} сетей")
     
-    # Проверяем доступность nmap
-    try:
-        import nmap
-        print("  - nmap доступен: Да")
-    except ImportError:
-        print("  - nmap доступен: Нет (установите: pip install python-nmap)")
+    # Проверка сканера выполняется в фоне, результат доступен в /health
+    start_readiness_probe()
+    print("  - проверка сканера: выполняется в фоне (см. /health)")
     
-    # Проверяем, что сканер работает
-    try:
-        test_result = scanner.scan_network("127.0.0.1/32")
-        print(f"  - сканер работает: Да (тест: {len(test_result)} устройств)")
-    except Exception as e:
-        print(f"  - сканер работает: Нет (ошибка: {e})")
+    start_webhook_delivery()
+    if app.config['WEBHOOK_URL']:
+        print(f"  - события изменений доставляются на {app.config['WEBHOOK_URL']}")
     
     print("=" * 60)
     print("Новые возможности:")
@@ -530,4 +1071,6 @@ if __name__ == '__main__':
     print("  - Логирование в реальном времени в веб-интерфейсе")
     print("=" * 60)
     
-    app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
+    # Без перезагрузчика: иначе запускаются два процесса, каждый со своим сканером
+    debug = os.environ.get('ASDUE_DEBUG', '1') == '1'
+    app.run(debug=debug, use_reloader=False, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Конфигурация gunicorn для АСДУЕ
+
+Запуск:
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Состояние сканирования (прогресс, результаты, логи) хранится в памяти
+процесса, поэтому HTTP обслуживает один процесс с пулом потоков.
+Сканирование (nmap, ping, опрос сервисов) выполняется в отдельном
+процессе (ASDUE_SCAN_ISOLATION=process) и не делит с ним GIL.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('ASDUE_BIND', '0.0.0.0:5000')
+
+# Один процесс: состояние сканирования не разделяется между процессами
+workers = 1
+worker_class = 'gthread'
+# Обработчики запросов в основном ждут ввода-вывода - потоков больше, чем ядер
+threads = int(os.environ.get('ASDUE_HTTP_THREADS', min(32, multiprocessing.cpu_count() * 4)))
+
+# Долгие опросы статуса не должны считаться зависанием воркера
+timeout = int(os.environ.get('ASDUE_WORKER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Приложение загружается в воркере: процесс сканирования порождается от него
+preload_app = False
+
+raw_env = [
+    f"ASDUE_SCAN_ISOLATION={os.environ.get('ASDUE_SCAN_ISOLATION', 'process')}",
+]
+
+accesslog = os.environ.get('ASDUE_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('ASDUE_LOG_LEVEL', 'info')
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест АСДУЕ: задержка HTTP-запросов до и во время сканирования
+
+Пример:
+    gunicorn -c gunicorn.conf.py "app:create_app()" &
+    python load_test.py --url http://127.0.0.1:5000 --clients 20 --duration 30
+
+Первая половина замера - без сканирования, затем запускается сканирование
+(POST /api/scan/start) и замер продолжается. Если HTTP-обработка
+изолирована от сканирования, задержки в обеих фазах близки.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import urllib.request
+
+ENDPOINTS = ['/api/scan/status', '/health', '/api/scan/logs']
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+def client(base_url, stop_event, samples, lock):
+    """Клиент: запросы по кругу до остановки, задержки пишутся в samples[фаза]"""
+    i = 0
+    while not stop_event.is_set():
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                response.read()
+            ok = True
+        except OSError:
+            # URLError, таймаут и разрыв соединения при чтении ответа
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            samples[samples['phase']].append(elapsed if ok else None)
+
+
+def report(name, values):
+    errors = sum(1 for v in values if v is None)
+    latencies = sorted(v for v in values if v is not None)
+    if not latencies:
+        print(f"{name}: нет успешных запросов (ошибок: {errors})")
+        return
+    print(f"{name}: запросов {len(latencies)}, ошибок {errors}, "
+          f"p50 {percentile(latencies, 0.5):.1f} мс, p95 {percentile(latencies, 0.95):.1f} мс, "
+          f"p99 {percentile(latencies, 0.99):.1f} мс, среднее {statistics.mean(latencies):.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест АСДУЕ')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30, help='Общая длительность, секунды')
+    parser.add_argument('--no-scan', action='store_true', help='Не запускать сканирование')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    samples = {'phase': 'idle', 'idle': [], 'scanning': []}
+    lock = threading.Lock()
+    stop_event = threading.Event()
+
+    threads = [
+        threading.Thread(target=client, args=(base_url, stop_event, samples, lock), daemon=True)
+        for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.duration / 2)
+
+    if not args.no_scan:
+        request = urllib.request.Request(base_url + '/api/scan/start', data=b'', method='POST')
+        with urllib.request.urlopen(request, timeout=30) as response:
+            print(f"Запуск сканирования: {response.read().decode('utf-8')}")
+    with lock:
+        samples['phase'] = 'scanning'
+
+    time.sleep(args.duration / 2)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=35)
+
+    report('Без сканирования', samples['idle'])
+    report('Во время сканирования', samples['scanning'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Агент сканирования АСДУЕ
+
+Запускается рядом с целевыми сегментами, забирает задания у центрального
+приложения по HTTP, сканирует сети через NetworkScanner и отправляет
+результаты сжатыми пакетами по мере сканирования: пакет уходит, когда
+набралось batch_size хостов или прошло send_interval секунд.
+
+Пример:
+    python -m scanner.agent --server http://10.0.0.1:5000 --agent-id plant-1 \\
+        --segment 10.20.0.0/16
+
+Проверка с несколькими агентами на одной машине (сначала сети ставятся
+в очередь, иначе агент с --once не найдет заданий и сразу завершится):
+    python app.py
+    curl -X POST -H 'Content-Type: application/json' \\
+        -d '{"networks": ["127.0.0.0/30", "127.0.0.128/30"]}' http://127.0.0.1:5000/api/agents/dispatch
+    python -m scanner.agent --server http://127.0.0.1:5000 --agent-id a1 --segment 127.0.0.0/25 --once &
+    python -m scanner.agent --server http://127.0.0.1:5000 --agent-id a2 --segment 127.0.0.128/25 --once &
+
+Лог сканера пишется в --log-file (по умолчанию logs/scanner.log
+относительно текущего каталога, каталог создается при запуске).
+"""
+
+import argparse
+import gzip
+import json
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+
+
+class ResultStream:
+    """Отправка хостов одного задания пакетами по мере их сбора сканером"""
+
+    def __init__(self, agent, assignment_id):
+        self.agent = agent
+        self.assignment_id = assignment_id
+        self.buffer = []
+        self.sent = set()
+        self.last_flush = time.monotonic()
+
+    def add(self, network, host):
+        """Host callback сканера: хост в буфер, пакет - по размеру или по времени"""
+        self.buffer.append(host)
+        if (len(self.buffer) >= self.agent.batch_size
+                or time.monotonic() - self.last_flush >= self.agent.send_interval):
+            try:
+                self.flush()
+            except urllib.error.URLError as e:
+                # Хосты остаются в буфере и уйдут со следующим пакетом
+                print(f"[{self.agent.agent_id}] Пакет не отправлен: {e}")
+
+    def flush(self, final=False):
+        """Отправка буфера пакетами не больше batch_size, последний помечается final"""
+        while self.buffer or final:
+            batch = self.buffer[:self.agent.batch_size]
+            last = final and len(batch) == len(self.buffer)
+            self.agent.send_batch(self.assignment_id, batch, last)
+            self.sent.update(host.get('ip') for host in batch)
+            del self.buffer[:len(batch)]
+            self.last_flush = time.monotonic()
+            if last:
+                break
+
+    def finish(self, hosts):
+        """Итоговый пакет: хосты результата, не прошедшие через callback, и остаток буфера"""
+        queued = self.sent | {host.get('ip') for host in self.buffer}
+        self.buffer.extend(host for host in hosts if host.get('ip') not in queued)
+        self.flush(final=True)
+
+
+class ScanAgent:
+    """Агент: получение заданий, сканирование, отправка результатов"""
+
+    def __init__(self, server, agent_id, segments=None, scanner=None,
+                 token=None, batch_size=200, poll_interval=10, log_file='logs/scanner.log',
+                 send_interval=5):
+        self.server = server.rstrip('/')
+        self.agent_id = agent_id
+        self.segments = segments or []
+        self.scanner = scanner
+        self.token = token
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.log_file = log_file
+        self.send_interval = send_interval
+
+    def get_scanner(self):
+        """Ленивое создание сканера"""
+        if self.scanner is None:
+            from .scanner import NetworkScanner
+            self.scanner = NetworkScanner(log_file=self.log_file)
+            self.scanner.set_web_log_callback(
+                lambda message, level='info': print(f"[{self.agent_id}] {message}")
+            )
+        return self.scanner
+
+    def request(self, method, path, payload=None, compress=False):
+        """HTTP-запрос к центральному приложению, ответ - JSON"""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['X-Agent-Token'] = self.token
+        data = None
+        if payload is not None:
+            data = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+            if compress:
+                data = gzip.compress(data)
+                headers['Content-Encoding'] = 'gzip'
+
+        req = urllib.request.Request(self.server + path, data=data, headers=headers, method=method)
+        with urllib.request.urlopen(req, timeout=30) as response:
+            body = response.read()
+        return json.loads(body) if body else {}
+
+    def register(self):
+        return self.request('POST', '/api/agents/register', {
+            'agent_id': self.agent_id,
+            'segments': self.segments
+        })
+
+    def fetch_work(self):
+        """Следующее задание или None"""
+        response = self.request('GET', f'/api/agents/work?agent_id={self.agent_id}')
+        return response.get('assignment')
+
+    def send_batch(self, assignment_id, hosts, final=False):
+        """Отправка одного пакета результатов задания"""
+        return self.request('POST', '/api/agents/results', {
+            'agent_id': self.agent_id,
+            'assignment_id': assignment_id,
+            'hosts': hosts,
+            'final': final
+        }, compress=True)
+
+    def release(self, assignment_id, error):
+        """Возврат невыполненного задания в очередь центрального приложения"""
+        return self.request('POST', '/api/agents/release', {
+            'agent_id': self.agent_id,
+            'assignment_id': assignment_id,
+            'error': error
+        })
+
+    def run_once(self):
+        """Выполнение одного задания, False если заданий нет или задание не выполнено"""
+        assignment = self.fetch_work()
+        if not assignment:
+            return False
+
+        network = assignment['network']
+        print(f"[{self.agent_id}] Задание: {network}")
+        scanner = self.get_scanner()
+        scanner.is_scanning = True
+        stream = ResultStream(self, assignment['assignment_id'])
+        scanner.set_host_callback(stream.add)
+        try:
+            hosts = scanner.scan_network(network)
+        except Exception as e:
+            # Пустой итог означал бы, что все хосты сети пропали: задание возвращается в очередь
+            print(f"[{self.agent_id}] Ошибка сканирования {network}: {e}, задание возвращено в очередь")
+            self.release(assignment['assignment_id'], str(e))
+            return False
+        finally:
+            scanner.set_host_callback(None)
+        stream.finish(hosts)
+        print(f"[{self.agent_id}] Отправлено хостов по сети {network}: {len(stream.sent)}")
+        return True
+
+    def run(self, once=False):
+        """Основной цикл агента"""
+        # Сканер создается до получения заданий: ошибка запуска не должна
+        # оставлять выданную сеть занятой до истечения аренды
+        self.get_scanner()
+        registered = False
+        while True:
+            try:
+                if not registered:
+                    self.register()
+                    registered = True
+                    print(f"[{self.agent_id}] Зарегистрирован на {self.server}, "
+                          f"сегменты: {self.segments or 'любые'}")
+                worked = self.run_once()
+            except urllib.error.HTTPError as e:
+                if e.code == 404:
+                    # Центральное приложение перезапущено и не знает агента
+                    print(f"[{self.agent_id}] Агент не зарегистрирован на сервере, повторная регистрация")
+                    registered = False
+                    continue
+                print(f"[{self.agent_id}] Ошибка сервера: HTTP {e.code} {e.reason}")
+                worked = False
+            except urllib.error.URLError as e:
+                print(f"[{self.agent_id}] Сервер недоступен: {e}")
+                worked = False
+            if once and not worked:
+                return
+            if not worked:
+                time.sleep(self.poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Агент сканирования АСДУЕ')
+    parser.add_argument('--server', required=True, help='Адрес центрального приложения')
+    parser.add_argument('--agent-id', default=socket.gethostname(), help='Идентификатор агента')
+    parser.add_argument('--segment', action='append', default=[],
+                        help='Сегмент, обслуживаемый агентом (можно несколько)')
+    parser.add_argument('--token', default=os.environ.get('ASDUE_AGENT_TOKEN'),
+                        help='Общий токен агентов')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--send-interval', type=float, default=5,
+                        help='Наибольшая пауза между пакетами результатов во время сканирования, секунды')
+    parser.add_argument('--poll-interval', type=float, default=10)
+    parser.add_argument('--once', action='store_true', help='Выйти, когда заданий не останется')
+    parser.add_argument('--log-file', default=os.environ.get('ASDUE_AGENT_LOG', 'logs/scanner.log'),
+                        help='Файл лога сканера')
+    args = parser.parse_args()
+
+    agent = ScanAgent(args.server, args.agent_id, args.segment, token=args.token,
+                      batch_size=args.batch_size, poll_interval=args.poll_interval,
+                      log_file=args.log_file, send_interval=args.send_interval)
+    agent.run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
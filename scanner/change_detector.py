@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Модуль обнаружения изменений в инвентаре сети АСДУЕ
+"""
+
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import threading
+import urllib.request
+from datetime import datetime
+
+# Типы событий изменений
+EVENT_HOST_NEW = 'host_new'
+EVENT_HOST_GONE = 'host_gone'
+EVENT_MAC_CHANGED = 'mac_changed'
+EVENT_OS_CHANGED = 'os_changed'
+EVENT_PORT_OPENED = 'port_opened'
+EVENT_PORT_CLOSED = 'port_closed'
+
+# Событий в одном POST доставщика webhook
+WEBHOOK_BATCH_SIZE = 500
+
+UNKNOWN = 'Unknown'
+
+# Суффикс точности nmap: "Linux 5.4 (accuracy: 96%)"
+OS_ACCURACY_RE = re.compile(r'\s*\(accuracy: \d+%\)$')
+
+
+def host_port_set(host):
+    """Множество открытых портов хоста (записи без номера порта пропускаются)"""
+    ports = set()
+    for port_info in host.get('ports', []) or []:
+        if isinstance(port_info, dict):
+            if port_info.get('state', 'open') != 'open':
+                continue
+            port_info = port_info.get('port')
+        try:
+            ports.add(int(port_info))
+        except (TypeError, ValueError):
+            continue
+    return ports
+
+
+def tail_lines(path, count, block_size=65536):
+    """Последние count строк файла, читая его блоками с конца"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # Нужна count + 1 граница строк: первая строка блока может быть неполной
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    return [line.decode('utf-8', errors='replace') for line in lines[-count:]]
+
+
+def os_name(value):
+    """Название ОС без точности nmap (колебания точности - не изменение)"""
+    return OS_ACCURACY_RE.sub('', value or '')
+
+
+def host_fingerprint(host):
+    """Отпечаток хоста: хэш от MAC, названия ОС и набора портов"""
+    ports = ','.join(str(p) for p in sorted(host_port_set(host)))
+    raw = f"{host.get('mac', '')}|{os_name(host.get('os', ''))}|{ports}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ChangeDetector:
+    """Сравнение результатов сканирования с предыдущим инвентарем"""
+
+    def __init__(self, inventory_file='results/inventory.json',
+                 events_file='logs/events.jsonl',
+                 webhook_queue_file='results/webhook_queue.jsonl'):
+        self.inventory_file = inventory_file
+        self.events_file = events_file
+        self.webhook_queue_file = webhook_queue_file
+        self.lock = threading.Lock()
+
+    def load_inventory(self):
+        """Загрузка предыдущего инвентаря {ip: запись}"""
+        if os.path.exists(self.inventory_file):
+            try:
+                with open(self.inventory_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return {}
+        return {}
+
+    def save_inventory(self, inventory):
+        """Атомарное сохранение инвентаря"""
+        directory = os.path.dirname(self.inventory_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = self.inventory_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(inventory, f, ensure_ascii=False)
+        os.replace(tmp_file, self.inventory_file)
+
+    def build_inventory(self, results, previous=None):
+        """Построение инвентаря из результатов сканирования.
+
+        Если MAC или ОС в этом сканировании не определены (ARP или nmap -O
+        не ответили), сохраняется последнее известное значение из previous.
+        """
+        previous = previous or {}
+        inventory = {}
+        for host in results:
+            ip = host.get('ip')
+            if not ip:
+                continue
+            old = previous.get(ip, {})
+            record = {
+                'mac': host.get('mac') or UNKNOWN,
+                'os': host.get('os') or UNKNOWN,
+                'ports': sorted(host_port_set(host)),
+                'last_seen': host.get('scan_time', '')
+            }
+            for field in ('mac', 'os'):
+                if record[field] == UNKNOWN and old.get(field):
+                    record[field] = old[field]
+            record['fingerprint'] = host_fingerprint(record)
+            inventory[ip] = record
+        return inventory
+
+    def diff(self, previous, current, scanned_networks=None):
+        """Сравнение двух инвентарей, возвращает список событий.
+
+        Хосты считаются пропавшими только если их адрес входит в одну из
+        просканированных сетей (scanned_networks), иначе частичное
+        сканирование пометило бы весь остальной инвентарь как исчезнувший.
+        """
+        timestamp = datetime.now().isoformat()
+        events = []
+        if scanned_networks is not None:
+            scanned_networks = parse_networks(scanned_networks)
+
+        def event(event_type, ip, **details):
+            entry = {'type': event_type, 'ip': ip, 'timestamp': timestamp}
+            entry.update(details)
+            events.append(entry)
+
+        for ip, host in current.items():
+            old = previous.get(ip)
+            if old is None:
+                event(EVENT_HOST_NEW, ip, mac=host['mac'], ports=host['ports'])
+                continue
+
+            # Отпечатки совпадают - хост не изменился
+            if old.get('fingerprint') == host['fingerprint']:
+                continue
+
+            # Переход из неизвестного значения в известное изменением не считается
+            old_mac = old.get('mac') or UNKNOWN
+            if old_mac != host['mac'] and UNKNOWN not in (old_mac, host['mac']):
+                event(EVENT_MAC_CHANGED, ip, old_mac=old_mac, new_mac=host['mac'])
+            old_os = old.get('os') or UNKNOWN
+            if os_name(old_os) != os_name(host['os']) and UNKNOWN not in (old_os, host['os']):
+                event(EVENT_OS_CHANGED, ip, old_os=old_os, new_os=host['os'])
+
+            old_ports = set(old.get('ports', []))
+            new_ports = set(host['ports'])
+            for port in sorted(new_ports - old_ports):
+                event(EVENT_PORT_OPENED, ip, port=port)
+            for port in sorted(old_ports - new_ports):
+                event(EVENT_PORT_CLOSED, ip, port=port)
+
+        for ip, old in previous.items():
+            if ip in current:
+                continue
+            if scanned_networks is not None and not ip_in_networks(ip, scanned_networks):
+                continue
+            event(EVENT_HOST_GONE, ip, mac=old.get('mac'), last_seen=old.get('last_seen'))
+
+        return events
+
+    def emit(self, events):
+        """Запись событий в журнал событий и очередь webhook (если она ведется)"""
+        if not events:
+            return
+        lines = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events)
+        for path in (self.events_file, self.webhook_queue_file):
+            if not path:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+    def process(self, results, scanned_networks=None):
+        """Полный цикл: сравнение, запись событий, обновление инвентаря"""
+        with self.lock:
+            previous = self.load_inventory()
+            current = self.build_inventory(results, previous)
+            events = self.diff(previous, current, scanned_networks)
+            self.emit(events)
+
+            # Хосты вне просканированных сетей остаются в инвентаре
+            merged = {}
+            if scanned_networks is not None:
+                parsed = parse_networks(scanned_networks)
+                for ip, host in previous.items():
+                    if not ip_in_networks(ip, parsed):
+                        merged[ip] = host
+            merged.update(current)
+            self.save_inventory(merged)
+            return events
+
+    def read_events(self, limit=100):
+        """Последние limit событий из журнала (limit не меньше 1)"""
+        if not os.path.exists(self.events_file):
+            return []
+        lines = tail_lines(self.events_file, max(1, limit))
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+    def drain_webhook_queue(self):
+        """Извлечение всех событий из очереди webhook (для доставщика)"""
+        with self.lock:
+            if not self.webhook_queue_file or not os.path.exists(self.webhook_queue_file):
+                return []
+            with open(self.webhook_queue_file, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            os.remove(self.webhook_queue_file)
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+    def requeue_webhook_events(self, events):
+        """Возврат недоставленных событий в начало очереди webhook"""
+        if not events or not self.webhook_queue_file:
+            return
+        lines = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events)
+        with self.lock:
+            # За время доставки в очередь могли попасть новые события
+            if os.path.exists(self.webhook_queue_file):
+                with open(self.webhook_queue_file, 'r', encoding='utf-8') as f:
+                    lines += f.read()
+            tmp_file = self.webhook_queue_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(lines)
+            os.replace(tmp_file, self.webhook_queue_file)
+
+    def deliver_webhook(self, url, timeout=10):
+        """Отправка очереди webhook POST-запросами {"events": [...]}.
+
+        Возвращает число доставленных событий. При ошибке недоставленные
+        события возвращаются в очередь, а ошибка пробрасывается вызывающему.
+        """
+        events = self.drain_webhook_queue()
+        delivered = 0
+        try:
+            while delivered < len(events):
+                batch = events[delivered:delivered + WEBHOOK_BATCH_SIZE]
+                body = json.dumps({'events': batch}, ensure_ascii=False).encode('utf-8')
+                request = urllib.request.Request(
+                    url, data=body, headers={'Content-Type': 'application/json'}, method='POST'
+                )
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                delivered += len(batch)
+        except OSError:
+            self.requeue_webhook_events(events[delivered:])
+            raise
+        return delivered
+
+
+def parse_networks(networks):
+    """Разбор списка сетей CIDR, некорректные записи пропускаются"""
+    parsed = []
+    for network in networks:
+        try:
+            parsed.append(ipaddress.ip_network(network, strict=False))
+        except ValueError:
+            continue
+    return parsed
+
+
+def ip_in_networks(ip, networks):
+    """Проверка принадлежности адреса хотя бы одной из разобранных сетей"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Модуль контрольных точек сканирования для АСДУЕ
+
+Прогресс пишется в журнал JSON Lines только дозаписью: каждая запись -
+одна строка, записываемая одним вызовом write() с fsync. Оборванная при
+падении последняя строка при чтении отбрасывается.
+
+Кроме завершенных сетей в журнал пишется каждый собранный хост, поэтому
+при продолжении большой сети уже собранные хосты повторно не опрашиваются.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+RECORD_START = 'start'
+RECORD_CURSOR = 'cursor'
+RECORD_HOST = 'host'
+RECORD_NETWORK_DONE = 'network_done'
+RECORD_FINISH = 'finish'
+
+
+class ScanCheckpoint:
+    """Журнал контрольных точек сканирования"""
+
+    def __init__(self, checkpoint_file='results/checkpoint.jsonl'):
+        self.checkpoint_file = checkpoint_file
+        self.lock = threading.Lock()
+
+    def begin(self, networks, start_time):
+        """Начало нового сканирования: атомарная замена журнала"""
+        directory = os.path.dirname(self.checkpoint_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        record = {
+            'type': RECORD_START,
+            'networks': networks,
+            'start_time': start_time,
+            'timestamp': datetime.now().isoformat()
+        }
+        tmp_file = self.checkpoint_file + '.tmp'
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.checkpoint_file)
+
+    def append(self, record):
+        """Дозапись одной записи в журнал"""
+        record.setdefault('timestamp', datetime.now().isoformat())
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self.lock:
+            with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def set_cursor(self, index, network):
+        """Отметка сети, сканирование которой начато"""
+        self.append({'type': RECORD_CURSOR, 'index': index, 'network': network})
+
+    def host_done(self, network, host):
+        """Хост сети собран (частичный результат незавершенной сети)"""
+        self.append({'type': RECORD_HOST, 'network': network, 'host': host})
+
+    def network_done(self, index, network, hosts):
+        """Сеть просканирована, сохраняем найденные хосты"""
+        self.append({'type': RECORD_NETWORK_DONE, 'index': index, 'network': network, 'hosts': hosts})
+
+    def finish(self, end_time):
+        """Сканирование завершено, продолжать нечего"""
+        self.append({'type': RECORD_FINISH, 'end_time': end_time})
+
+    def load(self):
+        """Восстановление состояния из журнала.
+
+        Возвращает None, если журнала нет или сканирование завершено, иначе
+        словарь с сетями, завершенными сетями, хостами, курсором и частичными
+        результатами незавершенных сетей (partial: {сеть: [хосты]}).
+        """
+        if not os.path.exists(self.checkpoint_file):
+            return None
+
+        state = None
+        with self.lock:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Недописанная строка при аварийном завершении
+                continue
+
+            record_type = record.get('type')
+            if record_type == RECORD_START:
+                state = {
+                    'networks': record.get('networks', []),
+                    'start_time': record.get('start_time'),
+                    'completed_networks': [],
+                    'results': [],
+                    'partial': {},
+                    'cursor': None,
+                    'finished': False,
+                    'updated_at': record.get('timestamp')
+                }
+                continue
+            if state is None:
+                continue
+
+            if record_type == RECORD_CURSOR:
+                state['cursor'] = record.get('network')
+            elif record_type == RECORD_HOST:
+                network = record.get('network')
+                host = record.get('host') or {}
+                if network not in state['completed_networks'] and host.get('ip'):
+                    state['partial'].setdefault(network, {})[host['ip']] = host
+            elif record_type == RECORD_NETWORK_DONE:
+                if record.get('network') not in state['completed_networks']:
+                    state['completed_networks'].append(record.get('network'))
+                    state['results'].extend(record.get('hosts', []))
+                    state['partial'].pop(record.get('network'), None)
+            elif record_type == RECORD_FINISH:
+                state['finished'] = True
+            state['updated_at'] = record.get('timestamp', state['updated_at'])
+
+        if state is None or state['finished']:
+            return None
+        state['partial'] = {network: list(hosts.values()) for network, hosts in state['partial'].items()}
+        return state
+
+    def summary(self):
+        """Краткая информация о незавершенном сканировании (без хостов)"""
+        state = self.load()
+        if state is None:
+            return None
+        return {
+            'networks_total': len(state['networks']),
+            'networks_completed': len(state['completed_networks']),
+            'hosts_found': len(state['results']),
+            'partial_hosts': sum(len(hosts) for hosts in state['partial'].values()),
+            'cursor': state['cursor'],
+            'start_time': state['start_time'],
+            'updated_at': state['updated_at']
+        }
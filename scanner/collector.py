@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Модуль центрального сборщика результатов агентов сканирования АСДУЕ
+
+Агент регистрируется со списком своих сегментов, забирает задания
+(сети из очереди, входящие в его сегменты) и присылает результаты
+пакетами по мере сканирования. Результаты сети принадлежат агенту,
+которому она выдана.
+Агент, не обращавшийся к сборщику дольше agent_timeout и не имеющий
+выданных заданий, считается неактивным: его сегменты могут забирать
+универсальные агенты.
+"""
+
+import ipaddress
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+class AgentCollector:
+    """Очередь заданий для агентов и слияние их результатов"""
+
+    def __init__(self, lease_seconds=3600, agent_timeout=300):
+        self.lease_seconds = lease_seconds
+        self.agent_timeout = agent_timeout
+        self.agents = {}        # agent_id -> {'segments', 'registered_at', 'last_seen'}
+        self.pending = []       # сети, ожидающие выдачи
+        self.assignments = {}   # assignment_id -> {'agent_id', 'network', 'issued', 'hosts', 'ips'}
+        self.lock = threading.Lock()
+
+    def register(self, agent_id, segments=None):
+        """Регистрация агента и его сегментов (пустой список - любые сети)"""
+        parsed = []
+        for segment in segments or []:
+            parsed.append(ipaddress.ip_network(segment, strict=False))
+        with self.lock:
+            self.agents[agent_id] = {
+                'segments': parsed,
+                'registered_at': datetime.now().isoformat(),
+                'last_seen': time.time()
+            }
+
+    def enqueue(self, networks):
+        """Постановка сетей в очередь (уже ожидающие и выданные не дублируются)"""
+        with self.lock:
+            active = {a['network'] for a in self.assignments.values()}
+            added = 0
+            for network in networks:
+                if network not in self.pending and network not in active:
+                    self.pending.append(network)
+                    added += 1
+            return added
+
+    def _owns(self, agent, network):
+        if not agent['segments']:
+            return True
+        try:
+            target = ipaddress.ip_network(network, strict=False)
+        except ValueError:
+            return False
+        return any(
+            segment.version == target.version and target.subnet_of(segment)
+            for segment in agent['segments']
+        )
+
+    def _is_active(self, agent_id, agent, now):
+        """Агент недавно обращался к сборщику или выполняет задание"""
+        if now - agent['last_seen'] <= self.agent_timeout:
+            return True
+        return any(a['agent_id'] == agent_id for a in self.assignments.values())
+
+    def _owned_by_specific_agent(self, network, exclude_agent_id):
+        """Есть ли другой активный агент, явно обслуживающий сегмент этой сети"""
+        now = time.time()
+        for agent_id, agent in self.agents.items():
+            if agent_id == exclude_agent_id or not agent['segments']:
+                continue
+            if self._owns(agent, network) and self._is_active(agent_id, agent, now):
+                return True
+        return False
+
+    def _requeue_expired(self):
+        now = time.time()
+        for assignment_id in list(self.assignments):
+            assignment = self.assignments[assignment_id]
+            if now - assignment['issued'] > self.lease_seconds:
+                del self.assignments[assignment_id]
+                self.pending.insert(0, assignment['network'])
+
+    def next_assignment(self, agent_id):
+        """Выдача агенту следующей сети из его сегментов или None"""
+        with self.lock:
+            agent = self.agents.get(agent_id)
+            if agent is None:
+                raise KeyError(agent_id)
+            agent['last_seen'] = time.time()
+            self._requeue_expired()
+
+            for index, network in enumerate(self.pending):
+                if not self._owns(agent, network):
+                    continue
+                # Универсальный агент не забирает сети, у которых есть свой агент
+                if not agent['segments'] and self._owned_by_specific_agent(network, agent_id):
+                    continue
+                del self.pending[index]
+                assignment_id = uuid.uuid4().hex
+                self.assignments[assignment_id] = {
+                    'agent_id': agent_id,
+                    'network': network,
+                    'issued': time.time(),
+                    'hosts': 0,
+                    'ips': set()    # адреса всех принятых хостов задания
+                }
+                return {'assignment_id': assignment_id, 'network': network}
+            return None
+
+    def accept_batch(self, agent_id, assignment_id, hosts, final=False):
+        """Прием пакета результатов, возвращает (сеть, принятые хосты, адреса задания).
+
+        Принимаются только хосты, входящие в сеть задания этого агента.
+        Адреса задания (все хосты, принятые по нему) возвращаются только с
+        последним пакетом, иначе None: до конца сканирования прежние хосты
+        сети не удаляются.
+        """
+        with self.lock:
+            assignment = self.assignments.get(assignment_id)
+            if assignment is None or assignment['agent_id'] != agent_id:
+                raise KeyError(assignment_id)
+            agent = self.agents.get(agent_id)
+            if agent:
+                agent['last_seen'] = time.time()
+            # Продление аренды при каждом пакете
+            assignment['issued'] = time.time()
+            network = assignment['network']
+            target = ipaddress.ip_network(network, strict=False)
+
+            accepted = []
+            for host in hosts:
+                try:
+                    if ipaddress.ip_address(host.get('ip', '')) in target:
+                        host['agent_id'] = agent_id
+                        accepted.append(host)
+                except ValueError:
+                    continue
+            assignment['hosts'] += len(accepted)
+            assignment['ips'].update(host['ip'] for host in accepted)
+            received = None
+            if final:
+                received = assignment['ips']
+                del self.assignments[assignment_id]
+        return network, accepted, received
+
+    def release(self, agent_id, assignment_id):
+        """Возврат невыполненного задания в начало очереди, возвращает его сеть"""
+        with self.lock:
+            assignment = self.assignments.get(assignment_id)
+            if assignment is None or assignment['agent_id'] != agent_id:
+                raise KeyError(assignment_id)
+            agent = self.agents.get(agent_id)
+            if agent:
+                agent['last_seen'] = time.time()
+            del self.assignments[assignment_id]
+            self.pending.insert(0, assignment['network'])
+            return assignment['network']
+
+    def status(self):
+        """Состояние агентов и очереди"""
+        with self.lock:
+            now = time.time()
+            return {
+                'agents': {
+                    agent_id: {
+                        'segments': [str(s) for s in agent['segments']],
+                        'registered_at': agent['registered_at'],
+                        'last_seen': datetime.fromtimestamp(agent['last_seen']).isoformat(),
+                        'active': self._is_active(agent_id, agent, now)
+                    }
+                    for agent_id, agent in self.agents.items()
+                },
+                'pending': list(self.pending),
+                'assignments': [
+                    {'agent_id': a['agent_id'], 'network': a['network'], 'hosts': a['hosts']}
+                    for a in self.assignments.values()
+                ]
+            }
+
+
+def merge_network_results(results, network, hosts, replace_network=False):
+    """Слияние хостов сети в общий список результатов.
+
+    replace_network=True удаляет прежние хосты этой сети (итог локального
+    сканирования), иначе записи обновляются по IP (пакеты агентов).
+    """
+    target = ipaddress.ip_network(network, strict=False)
+
+    def in_network(host):
+        try:
+            return ipaddress.ip_address(host.get('ip', '')) in target
+        except ValueError:
+            return False
+
+    if replace_network:
+        merged = [host for host in results if not in_network(host)]
+    else:
+        merged = list(results)
+
+    index = {host.get('ip'): i for i, host in enumerate(merged)}
+    for host in hosts:
+        position = index.get(host.get('ip'))
+        if position is None:
+            index[host.get('ip')] = len(merged)
+            merged.append(host)
+        else:
+            merged[position] = host
+    return merged
+
+
+def prune_network_results(results, network, keep_ips):
+    """Удаление хостов сети, адресов которых нет в keep_ips (итог задания агента)"""
+    target = ipaddress.ip_network(network, strict=False)
+    pruned = []
+    for host in results:
+        try:
+            gone = ipaddress.ip_address(host.get('ip', '')) in target and host.get('ip') not in keep_ips
+        except ValueError:
+            gone = False
+        if not gone:
+            pruned.append(host)
+    return pruned
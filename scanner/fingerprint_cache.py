@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Модуль кэша результатов определения ОС для АСДУЕ
+
+Ключ - MAC-адрес и хэш набора открытых портов: пока оборудование и
+открытые порты хоста не меняются, повторный запуск nmap -O не нужен.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def fingerprint_key(mac, ports):
+    """Ключ кэша: MAC + хэш отсортированного набора портов, None если MAC неизвестен"""
+    if not mac or mac == 'Unknown':
+        return None
+    port_list = ','.join(str(p) for p in sorted(set(int(p) for p in ports)))
+    port_hash = hashlib.sha1(port_list.encode('utf-8')).hexdigest()[:16]
+    return f"{mac.upper()}|{port_hash}"
+
+
+class FingerprintCache:
+    """LRU-кэш значений ОС с TTL и сохранением на диск"""
+
+    def __init__(self, cache_file='results/os_cache.json', ttl=7 * 24 * 3600, max_entries=10000):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (os, stored_at)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Загрузка кэша с диска (устаревшие записи отбрасываются)"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self.lock:
+            # Файл хранит записи от давних к недавним - порядок LRU сохраняется
+            for key, os_name, stored_at in data.get('entries', []):
+                if now - stored_at <= self.ttl:
+                    self.entries[key] = (os_name, stored_at)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        """Атомарное сохранение кэша, если были изменения"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'entries': [[key, os_name, stored_at] for key, (os_name, stored_at) in self.entries.items()]}
+            self.dirty = False
+
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def get(self, mac, ports):
+        """Значение ОС из кэша или None"""
+        key = fingerprint_key(mac, ports)
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                    self.dirty = True
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, mac, ports, os_name):
+        """Сохранение значения ОС (неопределенная ОС не кэшируется)"""
+        key = fingerprint_key(mac, ports)
+        if key is None or not os_name or os_name == 'Unknown':
+            return
+        with self.lock:
+            self.entries[key] = (os_name, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def stats(self):
+        """Статистика попаданий для настройки TTL"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
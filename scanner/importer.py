@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Модуль потокового импорта списков сетей и хостов для АСДУЕ
+
+Поддерживаются текст (по одной записи на строку), CSV, JSON Lines,
+JSON-массив (формат networks.json) и их gzip-варианты. Файл читается
+построчно (JSON-массив - целиком), каждая запись проверяется и
+нормализуется через ipaddress. Адрес с маской считается сетью, адрес
+без маски - известным хостом (seed), который сканируется напрямую.
+Неуказанные адреса (0.0.0.0, ::) и слишком большие диапазоны (например,
+0.0.0.0/0 из шаблона) отклоняются с ошибкой в отчете по строкам.
+"""
+
+import bisect
+import csv
+import gzip
+import io
+import ipaddress
+import json
+
+GZIP_MAGIC = b'\x1f\x8b'
+MAX_REPORTED_ERRORS = 1000
+# Наибольший импортируемый диапазон: /16 для IPv4, /112 для IPv6
+MAX_NETWORK_ADDRESSES = 65536
+
+# Поля JSON и заголовки столбцов CSV, в которых ищется адрес
+JSON_FIELDS = ('network', 'cidr', 'subnet', 'ip', 'host', 'address')
+
+
+def open_text_stream(stream, filename=''):
+    """Текстовый поток из бинарного, gzip распознается по сигнатуре"""
+    if hasattr(stream, 'peek'):
+        head = stream.peek(2)[:2]
+    elif stream.seekable():
+        position = stream.tell()
+        head = stream.read(2)
+        stream.seek(position)
+    else:
+        stream = io.BufferedReader(stream)
+        head = stream.peek(2)[:2]
+
+    if head == GZIP_MAGIC or (filename or '').lower().endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    # utf-8-sig: BOM, который добавляют Excel и Блокнот, не попадает в первую запись
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def detect_format(filename):
+    """Формат по расширению (без .gz): csv, json, jsonl или text"""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.json'):
+        return 'json'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'text'
+
+
+def parse_address(value):
+    """Разбор без проверки диапазона: ('network', ip_network) или ('seed', ip_address)"""
+    value = value.strip()
+    if '/' in value:
+        return 'network', ipaddress.ip_network(value, strict=False)
+    return 'seed', ipaddress.ip_address(value)
+
+
+def parse_entry(value):
+    """Разбор записи: ('network', 'a.b.c.d/nn') или ('seed', 'a.b.c.d')
+
+    ValueError, если запись не адрес, адрес неуказанный или диапазон
+    больше MAX_NETWORK_ADDRESSES.
+    """
+    kind, parsed = parse_address(value)
+    if kind == 'network':
+        if parsed.network_address.is_unspecified:
+            raise ValueError(f'неуказанный диапазон {parsed}')
+        if parsed.num_addresses > MAX_NETWORK_ADDRESSES:
+            raise ValueError(f'слишком большой диапазон {parsed}: {parsed.num_addresses} адресов '
+                             f'(не более {MAX_NETWORK_ADDRESSES})')
+    elif parsed.is_unspecified:
+        raise ValueError(f'неуказанный адрес {parsed}')
+    return kind, str(parsed)
+
+
+def is_address(value):
+    """Значение разбирается как адрес или сеть (размер диапазона не проверяется)"""
+    try:
+        parse_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def record_value(record):
+    """Адрес из элемента JSON: (значение или None, ошибка или None)"""
+    if isinstance(record, str):
+        return record, None
+    if not isinstance(record, dict):
+        return None, 'ожидается строка или объект JSON'
+    value = next((record[field] for field in JSON_FIELDS if record.get(field)), None)
+    if value is None:
+        return None, f'нет поля адреса ({", ".join(JSON_FIELDS)})'
+    return str(value), None
+
+
+def iter_csv_values(text_stream):
+    """Записи CSV: столбец адреса по заголовку (ip, network, cidr...),
+    без заголовка - первая ячейка, которая разбирается как адрес"""
+    column = None
+    for line_number, row in enumerate(csv.reader(text_stream), 1):
+        cells = [cell.strip() for cell in row]
+        if not any(cells) or cells[0].startswith('#'):
+            continue
+        if line_number == 1:
+            names = [cell.lower() for cell in cells]
+            column = next((names.index(field) for field in JSON_FIELDS if field in names), None)
+            if column is not None:
+                continue
+
+        if column is not None:
+            value = cells[column] if column < len(cells) else ''
+            if value:
+                yield line_number, value, None
+            else:
+                yield line_number, None, 'пустой столбец адреса'
+            continue
+
+        value = next((cell for cell in cells if cell and is_address(cell)), None)
+        if value is not None:
+            yield line_number, value, None
+        elif line_number != 1:
+            # Первая строка без адреса - заголовок с неизвестными именами столбцов
+            yield line_number, None, 'нет адреса в строке'
+
+
+def iter_json_lines(lines):
+    """Записи JSON Lines"""
+    for line_number, line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'некорректный JSON: {e}'
+            continue
+        value, error = record_value(record)
+        yield line_number, value, error
+
+
+def iter_values(text_stream, file_format):
+    """Записи файла: (номер строки, значение или None, ошибка формата или None)"""
+    if file_format == 'csv':
+        yield from iter_csv_values(text_stream)
+        return
+
+    if file_format == 'json':
+        # JSON-массив читается целиком; номер записи - позиция элемента
+        content = text_stream.read()
+        try:
+            document = json.loads(content)
+        except ValueError:
+            # Файл .json с записями JSON Lines
+            yield from iter_json_lines(enumerate(content.splitlines(), 1))
+            return
+        if isinstance(document, dict):
+            document = [document]
+        if not isinstance(document, list):
+            yield 1, None, 'ожидается массив JSON'
+            return
+        for number, record in enumerate(document, 1):
+            value, error = record_value(record)
+            yield number, value, error
+        return
+
+    if file_format == 'jsonl':
+        yield from iter_json_lines(enumerate(text_stream, 1))
+        return
+
+    for line_number, line in enumerate(text_stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            yield from iter_json_lines([(line_number, line)])
+            continue
+        # Комментарий в конце строки
+        yield line_number, line.split('#', 1)[0].strip(), None
+
+
+def import_stream(stream, filename='', existing_networks=None, existing_seeds=None):
+    """Импорт за один проход с дедупликацией против существующих списков.
+
+    Возвращает (сети, seed-хосты, отчет); списки включают существующие
+    записи в исходном порядке, новые добавляются в конец.
+    """
+    networks = list(existing_networks or [])
+    seeds = list(existing_seeds or [])
+    seen_networks = set()
+    for network in networks:
+        try:
+            seen_networks.add(str(ipaddress.ip_network(network, strict=False)))
+        except ValueError:
+            seen_networks.add(network)
+    seen_seeds = set(seeds)
+
+    report = {
+        'lines': 0,
+        'networks_added': 0,
+        'seeds_added': 0,
+        'duplicates': 0,
+        'errors_count': 0,
+        'errors': []
+    }
+
+    def error(line_number, value, message):
+        report['errors_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_number, 'value': value, 'error': message})
+
+    text_stream = open_text_stream(stream, filename)
+    try:
+        for line_number, value, format_error in iter_values(text_stream, detect_format(filename)):
+            report['lines'] += 1
+            if format_error:
+                error(line_number, value, format_error)
+                continue
+            try:
+                kind, normalized = parse_entry(value)
+            except ValueError as e:
+                error(line_number, value, str(e))
+                continue
+
+            if kind == 'network':
+                if normalized in seen_networks:
+                    report['duplicates'] += 1
+                    continue
+                seen_networks.add(normalized)
+                networks.append(normalized)
+                report['networks_added'] += 1
+            else:
+                if normalized in seen_seeds:
+                    report['duplicates'] += 1
+                    continue
+                seen_seeds.add(normalized)
+                seeds.append(normalized)
+                report['seeds_added'] += 1
+    except (OSError, EOFError) as e:
+        # Поврежденный gzip: импортированное до ошибки сохраняется
+        error(report['lines'] + 1, None, f'ошибка чтения файла: {e}')
+    finally:
+        text_stream.detach()
+
+    return networks, seeds, report
+
+
+def seed_targets(seeds, networks):
+    """Цели сканирования для seed-хостов вне заданных сетей.
+
+    Смежные адреса объединяются в CIDR-блоки без добавления лишних адресов.
+    """
+    # Сети сворачиваются в отсортированные интервалы для поиска делением пополам
+    ranges = {4: [], 6: []}
+    parsed = {4: [], 6: []}
+    for network in networks:
+        try:
+            network = ipaddress.ip_network(network, strict=False)
+        except ValueError:
+            continue
+        parsed[network.version].append(network)
+    for version, version_networks in parsed.items():
+        for network in ipaddress.collapse_addresses(version_networks):
+            ranges[version].append((int(network.network_address), int(network.broadcast_address)))
+    starts = {version: [r[0] for r in version_ranges] for version, version_ranges in ranges.items()}
+
+    outside = []
+    for seed in seeds:
+        try:
+            address = ipaddress.ip_address(seed)
+        except ValueError:
+            continue
+        value = int(address)
+        index = bisect.bisect_right(starts[address.version], value) - 1
+        if index >= 0 and ranges[address.version][index][1] >= value:
+            continue
+        outside.append(ipaddress.ip_network(address))
+
+    targets = []
+    for version in (4, 6):
+        same_version = [n for n in outside if n.version == version]
+        targets.extend(str(n) for n in ipaddress.collapse_addresses(same_version))
+    return targets
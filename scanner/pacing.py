@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Модуль управления темпом опроса для АСДУЕ
+
+Ведра токенов на каждую сеть и каждый хост. Скорость сети подстраивается
+по наблюдаемым RTT и потерям (аддитивное увеличение, мультипликативное
+уменьшение) и ограничивается жесткими пределами из конфигурации сети.
+RTT каждого хоста сравнивается с его собственным базовым RTT: в одной
+сети бывают хосты с RTT 0.4 мс и 4 мс, и это не перегрузка.
+"""
+
+import ipaddress
+import json
+import os
+import threading
+import time
+
+DEFAULT_LIMITS = {
+    'initial_rate': 20.0,   # начальная скорость, проб/с на сеть
+    'min_rate': 1.0,        # нижняя граница скорости сети
+    'max_rate': 200.0,      # жесткий верхний предел скорости сети
+    'host_rate': 5.0,       # предел проб/с на один хост
+    'increase': 2.0,        # аддитивное увеличение на успешную пробу
+    'decrease': 0.5,        # множитель при потере
+    'rtt_factor': 3.0,      # рост RTT хоста во столько раз относительно его базового - признак перегрузки
+    'min_rtt': 0.001,       # базовый RTT не ниже этого значения, с: джиттер локальной сети - не перегрузка
+}
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, емкость capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+            self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def reserve(self):
+        """Забрать токен, вернуть время ожидания в секундах до его готовности"""
+        with self.lock:
+            self._refill()
+            self.tokens -= 1.0
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRtt:
+    """RTT одного хоста: базовый (минимальный) и сглаженный"""
+
+    def __init__(self, rtt):
+        self.base = rtt
+        self.srtt = rtt
+
+    def update(self, rtt):
+        self.base = min(self.base, rtt)
+        self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+
+class NetworkPace:
+    """Состояние темпа одной сети"""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.rate = min(limits['initial_rate'], limits['max_rate'])
+        self.bucket = TokenBucket(self.rate)
+        self.host_rtts = {}        # хост -> HostRtt (сохраняется между проходами)
+        self.probes = 0
+        self.losses = 0
+        self.alive_hosts = set()   # хосты, ответившие в текущем проходе по сети
+        self.host_buckets = {}
+
+    def srtt(self):
+        """Средний сглаженный RTT хостов сети (только для отображения)"""
+        if not self.host_rtts:
+            return None
+        return sum(h.srtt for h in self.host_rtts.values()) / len(self.host_rtts)
+
+    def adjust(self, rate):
+        rate = max(self.limits['min_rate'], min(self.limits['max_rate'], rate))
+        if rate != self.rate:
+            self.rate = rate
+            self.bucket.set_rate(rate)
+
+
+class ProbePacer:
+    """Темп опроса по сетям и хостам"""
+
+    def __init__(self, limits=None, network_limits=None, sleep=time.sleep):
+        self.default_limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.default_limits.update(limits)
+        self.network_limits = {}
+        self.set_network_limits(network_limits or {})
+        self.sleep = sleep
+        self.networks = {}
+        self.lock = threading.Lock()
+
+    def set_network_limits(self, network_limits):
+        """Жесткие пределы по сетям: {cidr: {'max_rate': ..., 'host_rate': ...}}"""
+        parsed = {}
+        for cidr, limits in network_limits.items():
+            try:
+                parsed[ipaddress.ip_network(cidr, strict=False)] = limits
+            except ValueError:
+                continue
+        self.network_limits = parsed
+
+    def load_config(self, path):
+        """Загрузка конфигурации из JSON: {"default": {...}, "networks": {cidr: {...}}}"""
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.default_limits.update(config.get('default', {}))
+        self.set_network_limits(config.get('networks', {}))
+        with self.lock:
+            self.networks = {}
+        return True
+
+    def limits_for(self, network):
+        """Пределы для сети: значения по умолчанию + наиболее точное совпадение"""
+        limits = dict(self.default_limits)
+        try:
+            target = ipaddress.ip_network(network, strict=False)
+        except ValueError:
+            return limits
+        best = None
+        for configured, overrides in self.network_limits.items():
+            if configured.version == target.version and target.subnet_of(configured):
+                if best is None or configured.prefixlen > best[0].prefixlen:
+                    best = (configured, overrides)
+        if best:
+            limits.update(best[1])
+        return limits
+
+    def _network(self, network):
+        with self.lock:
+            pace = self.networks.get(network)
+            if pace is None:
+                pace = NetworkPace(self.limits_for(network))
+                self.networks[network] = pace
+            return pace
+
+    def _host_bucket(self, network, host):
+        pace = self._network(network)
+        with self.lock:
+            bucket = pace.host_buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(pace.limits['host_rate'])
+                pace.host_buckets[host] = bucket
+            return bucket
+
+    def release_hosts(self, network):
+        """Завершение прохода по сети: ведра хостов и отметки ответа сбрасываются
+
+        Скорость сети и RTT хостов сохраняются до следующего прохода.
+        """
+        pace = self._network(network)
+        with self.lock:
+            pace.host_buckets = {}
+            pace.alive_hosts = set()
+
+    def acquire(self, network, host=None):
+        """Ожидание разрешения на отправку пробы в сеть (и на хост)"""
+        wait = self._network(network).bucket.reserve()
+        if host is not None:
+            wait = max(wait, self._host_bucket(network, host).reserve())
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def record(self, network, host, rtt=None, success=True):
+        """Учет результата пробы и подстройка скорости сети.
+
+        Перегрузка - рост сглаженного RTT хоста относительно его же базового.
+        Потерей считается только неответ хоста, уже ответившего в текущем
+        проходе: адрес, который не отвечает с начала прохода (свободный или
+        выключенный хост), скорость сети не снижает.
+        """
+        pace = self._network(network)
+        limits = pace.limits
+        with self.lock:
+            pace.probes += 1
+            if success:
+                pace.alive_hosts.add(host)
+                congested = False
+                if rtt is not None:
+                    host_rtt = pace.host_rtts.get(host)
+                    if host_rtt is None:
+                        pace.host_rtts[host] = HostRtt(rtt)
+                    else:
+                        host_rtt.update(rtt)
+                        base = max(host_rtt.base, limits['min_rtt'])
+                        congested = host_rtt.srtt > base * limits['rtt_factor']
+                new_rate = pace.rate * limits['decrease'] if congested else pace.rate + limits['increase']
+            elif host in pace.alive_hosts:
+                # Повторный неответ того же хоста не считается новой потерей,
+                # пока хост снова не ответит
+                pace.alive_hosts.discard(host)
+                pace.losses += 1
+                new_rate = pace.rate * limits['decrease']
+            else:
+                return
+        pace.adjust(new_rate)
+
+    def inter_network_delay(self, network):
+        """Пауза после сети: один интервал между пробами при текущей скорости"""
+        return 1.0 / self._network(network).rate
+
+    def nmap_args(self, network):
+        """Аргументы темпа nmap: шаблон -T и --max-rate по текущей скорости сети
+
+        Скорость уже ограничена жестким пределом max_rate сети (см. adjust).
+        """
+        pace = self._network(network)
+        if pace.rate < 5:
+            timing = '-T2'
+        elif pace.rate < pace.limits['initial_rate']:
+            timing = '-T3'
+        else:
+            timing = '-T4'
+        max_rate = min(pace.rate, pace.limits['max_rate'])
+        return f"{timing} --max-rate {int(max(1, max_rate))}"
+
+    def stats(self):
+        """Текущее состояние темпа по сетям"""
+        with self.lock:
+            stats = {}
+            for network, pace in self.networks.items():
+                srtt = pace.srtt()
+                stats[network] = {
+                    'rate': round(pace.rate, 2),
+                    'max_rate': pace.limits['max_rate'],
+                    'srtt_ms': round(srtt * 1000, 1) if srtt is not None else None,
+                    'probes': pace.probes,
+                    'losses': pace.losses
+                }
+            return stats
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Модуль пассивного обнаружения хостов для АСДУЕ
+
+Источники: таблица соседей ядра (ARP/NDP), файлы аренд DHCP
+(dnsmasq и ISC dhcpd) и pcap-файл, прочитанный офлайн.
+
+В pcap MAC отправителя IPv4-пакета - это MAC последнего маршрутизатора,
+если хост в другой подсети. Поэтому пары (IP, MAC) из IPv4 принимаются
+только для непосредственно подключенных подсетей, пары из ARP - всегда.
+
+Собранный снимок используется для всех сетей одного обхода: он хранится
+cache_seconds секунд, а разбор pcap - пока файл не изменится.
+"""
+
+import ipaddress
+import os
+import re
+import struct
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+MAC_RE = re.compile(r'^([0-9A-Fa-f]{2}[:-]){5}[0-9A-Fa-f]{2}$')
+
+DEFAULT_DNSMASQ_LEASES = [
+    '/var/lib/misc/dnsmasq.leases',
+    '/var/lib/dnsmasq/dnsmasq.leases',
+]
+DEFAULT_DHCPD_LEASES = [
+    '/var/lib/dhcp/dhcpd.leases',
+    '/var/lib/dhcpd/dhcpd.leases',
+]
+
+# Состояния записей таблицы соседей, которые не подтверждают наличие хоста
+NEIGH_BAD_STATES = {'FAILED', 'INCOMPLETE', 'NOARP'}
+
+
+def normalize_mac(mac):
+    """Приведение MAC к виду AA:BB:CC:DD:EE:FF, None если формат неверный"""
+    if not mac or not MAC_RE.match(mac):
+        return None
+    mac = mac.replace('-', ':').upper()
+    if mac == '00:00:00:00:00:00':
+        return None
+    return mac
+
+
+class PassiveDiscovery:
+    """Сбор живых хостов из локальных источников без отправки пакетов"""
+
+    def __init__(self, dnsmasq_leases=None, dhcpd_leases=None, pcap_file=None,
+                 use_neighbors=True, local_networks=None, cache_seconds=60):
+        self.dnsmasq_leases = dnsmasq_leases if dnsmasq_leases is not None else DEFAULT_DNSMASQ_LEASES
+        self.dhcpd_leases = dhcpd_leases if dhcpd_leases is not None else DEFAULT_DHCPD_LEASES
+        self.pcap_file = pcap_file
+        self.use_neighbors = use_neighbors
+        # Подсети, в которых MAC источника IPv4 из pcap принадлежит самому хосту
+        # (None - подсети интерфейсов этой машины)
+        self.local_networks = local_networks
+        self.cache_seconds = cache_seconds
+        self.snapshot = None       # (время сбора, хосты)
+        self.pcap_cache = None     # (ключ файла, пары IP-MAC)
+        self.lock = threading.Lock()
+
+    def snapshot_hosts(self):
+        """Хосты всех источников, собранные не раньше cache_seconds назад
+
+        Сети одного обхода фильтруют один снимок: таблица соседей, аренды
+        и pcap не перечитываются для каждой сети.
+        """
+        with self.lock:
+            if self.snapshot is not None and time.monotonic() - self.snapshot[0] < self.cache_seconds:
+                return self.snapshot[1]
+            hosts = self.collect()
+            self.snapshot = (time.monotonic(), hosts)
+            return hosts
+
+    def pcap_pairs(self, local_networks):
+        """Пары (IP, MAC) из pcap; файл разбирается заново, только если он изменился"""
+        try:
+            stat = os.stat(self.pcap_file)
+        except OSError:
+            return []
+        key = (self.pcap_file, stat.st_mtime_ns, stat.st_size, tuple(str(n) for n in local_networks))
+        if self.pcap_cache is not None and self.pcap_cache[0] == key:
+            return self.pcap_cache[1]
+        pairs = list(self.read_pcap(self.pcap_file, local_networks))
+        self.pcap_cache = (key, pairs)
+        return pairs
+
+    def collect(self):
+        """Сбор хостов из всех источников: {ip: {'mac', 'hostname', 'sources'}}"""
+        hosts = {}
+
+        def add(ip, mac=None, hostname='', source=''):
+            entry = hosts.setdefault(ip, {'mac': None, 'hostname': '', 'sources': []})
+            if mac and not entry['mac']:
+                entry['mac'] = mac
+            if hostname and not entry['hostname']:
+                entry['hostname'] = hostname
+            if source not in entry['sources']:
+                entry['sources'].append(source)
+
+        if self.use_neighbors:
+            for ip, mac in self.read_neighbors():
+                add(ip, mac, source='neighbor')
+        for path in self.dnsmasq_leases:
+            for ip, mac, hostname in self.read_dnsmasq_leases(path):
+                add(ip, mac, hostname, source='dnsmasq')
+        for path in self.dhcpd_leases:
+            for ip, mac, hostname in self.read_dhcpd_leases(path):
+                add(ip, mac, hostname, source='dhcpd')
+        if self.pcap_file:
+            local_networks = self.local_networks
+            if local_networks is None:
+                local_networks = self.read_local_networks()
+            for ip, mac in self.pcap_pairs(local_networks):
+                add(ip, mac, source='pcap')
+
+        return hosts
+
+    def hosts_in_network(self, network_cidr, hosts=None):
+        """Хосты из пассивных источников, входящие в заданную сеть"""
+        network = ipaddress.ip_network(network_cidr, strict=False)
+        if hosts is None:
+            hosts = self.snapshot_hosts()
+        found = {}
+        for ip, info in hosts.items():
+            try:
+                if ipaddress.ip_address(ip) in network:
+                    found[ip] = info
+            except ValueError:
+                continue
+        return found
+
+    def read_neighbors(self):
+        """Таблица соседей ядра: `ip neigh`, при отсутствии - /proc/net/arp"""
+        try:
+            result = subprocess.run(
+                ['ip', 'neigh', 'show'],
+                capture_output=True,
+                text=True,
+                timeout=2
+            )
+            if result.returncode == 0:
+                return list(self.parse_ip_neigh(result.stdout))
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+        try:
+            with open('/proc/net/arp', 'r') as f:
+                return list(self.parse_proc_arp(f.read()))
+        except OSError:
+            return []
+
+    def read_local_networks(self):
+        """Непосредственно подключенные подсети: `ip -o addr show`"""
+        try:
+            result = subprocess.run(
+                ['ip', '-o', 'addr', 'show'],
+                capture_output=True,
+                text=True,
+                timeout=2
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return []
+        if result.returncode != 0:
+            return []
+        return list(self.parse_ip_addr(result.stdout))
+
+    @staticmethod
+    def parse_ip_addr(output):
+        """Разбор вывода `ip -o addr show` (loopback пропускается)"""
+        for line in output.splitlines():
+            parts = line.split()
+            for family in ('inet', 'inet6'):
+                if family not in parts:
+                    continue
+                try:
+                    interface = ipaddress.ip_interface(parts[parts.index(family) + 1])
+                except (IndexError, ValueError):
+                    continue
+                if not interface.is_loopback and not interface.is_link_local:
+                    yield interface.network
+
+    @staticmethod
+    def parse_ip_neigh(output):
+        """Разбор вывода `ip neigh show`"""
+        for line in output.splitlines():
+            parts = line.split()
+            if not parts or parts[-1] in NEIGH_BAD_STATES or 'lladdr' not in parts:
+                continue
+            mac = normalize_mac(parts[parts.index('lladdr') + 1])
+            if mac:
+                yield parts[0], mac
+
+    @staticmethod
+    def parse_proc_arp(content):
+        """Разбор /proc/net/arp (флаг 0x0 - неполная запись)"""
+        for line in content.splitlines()[1:]:
+            parts = line.split()
+            if len(parts) < 4 or parts[2] == '0x0':
+                continue
+            mac = normalize_mac(parts[3])
+            if mac:
+                yield parts[0], mac
+
+    @staticmethod
+    def read_dnsmasq_leases(path):
+        """Файл аренд dnsmasq: `expiry mac ip hostname client-id`"""
+        if not os.path.exists(path):
+            return []
+        leases = []
+        now = datetime.now().timestamp()
+        try:
+            with open(path, 'r', errors='replace') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 4:
+                        continue
+                    try:
+                        expiry = int(parts[0])
+                    except ValueError:
+                        continue
+                    # 0 - бессрочная аренда
+                    if expiry and expiry < now:
+                        continue
+                    hostname = parts[3] if parts[3] != '*' else ''
+                    leases.append((parts[2], normalize_mac(parts[1]), hostname))
+        except OSError:
+            return []
+        return leases
+
+    @staticmethod
+    def read_dhcpd_leases(path):
+        """Файл аренд ISC dhcpd (блоки `lease <ip> { ... }`)"""
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', errors='replace') as f:
+                content = f.read()
+        except OSError:
+            return []
+
+        # Последний блок для адреса актуален, поэтому используем словарь
+        leases = {}
+        for match in re.finditer(r'lease\s+([0-9.]+)\s*\{(.*?)\}', content, re.S):
+            ip, body = match.group(1), match.group(2)
+            state = re.search(r'binding state\s+(\w+);', body)
+            if state and state.group(1) != 'active':
+                leases.pop(ip, None)
+                continue
+            mac = re.search(r'hardware ethernet\s+([0-9A-Fa-f:]+);', body)
+            hostname = re.search(r'client-hostname\s+"([^"]*)";', body)
+            leases[ip] = (
+                ip,
+                normalize_mac(mac.group(1)) if mac else None,
+                hostname.group(1) if hostname else ''
+            )
+        return list(leases.values())
+
+    @staticmethod
+    def read_pcap(path, local_networks=()):
+        """Офлайн-разбор pcap (Ethernet): отправители ARP и источники IPv4.
+
+        Источники IPv4 учитываются только внутри local_networks; пара из
+        ARP имеет приоритет над парой из IPv4 для того же адреса.
+        """
+        local_networks = [ipaddress.ip_network(n, strict=False) for n in local_networks or ()]
+        pairs = {}
+        arp_ips = set()
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(24)
+                if len(header) < 24:
+                    return []
+                magic = header[:4]
+                if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+                    endian = '<'
+                elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+                    endian = '>'
+                else:
+                    return []
+                linktype = struct.unpack(endian + 'I', header[20:24])[0]
+                if linktype != 1:
+                    return []
+
+                while True:
+                    record = f.read(16)
+                    if len(record) < 16:
+                        break
+                    incl_len = struct.unpack(endian + 'I', record[8:12])[0]
+                    frame = f.read(incl_len)
+                    if len(frame) < incl_len:
+                        break
+                    parsed = PassiveDiscovery.parse_ethernet_frame(frame)
+                    if not parsed:
+                        continue
+                    ip, mac, protocol = parsed
+                    if protocol == 'arp':
+                        pairs[ip] = mac
+                        arp_ips.add(ip)
+                    elif ip not in arp_ips and ip_in_networks(ip, local_networks):
+                        pairs[ip] = mac
+        except OSError:
+            return []
+        return list(pairs.items())
+
+    @staticmethod
+    def parse_ethernet_frame(frame):
+        """(ip, mac, 'arp' или 'ipv4') отправителя кадра или None"""
+        if len(frame) < 14:
+            return None
+        offset = 12
+        ethertype = struct.unpack('!H', frame[offset:offset + 2])[0]
+        # VLAN-тег 802.1Q
+        if ethertype == 0x8100 and len(frame) >= 18:
+            offset += 4
+            ethertype = struct.unpack('!H', frame[offset:offset + 2])[0]
+        payload = offset + 2
+
+        if ethertype == 0x0806 and len(frame) >= payload + 28:
+            mac = frame[payload + 8:payload + 14]
+            ip = frame[payload + 14:payload + 18]
+            protocol = 'arp'
+        elif ethertype == 0x0800 and len(frame) >= payload + 20:
+            mac = frame[6:12]
+            ip = frame[payload + 12:payload + 16]
+            protocol = 'ipv4'
+        else:
+            return None
+
+        address = ipaddress.ip_address(bytes(ip))
+        if address.is_unspecified or address.is_multicast or address.is_loopback:
+            return None
+        mac_str = normalize_mac(':'.join(f'{b:02X}' for b in mac))
+        if not mac_str:
+            return None
+        return str(address), mac_str, protocol
+
+
+def ip_in_networks(ip, networks):
+    """Проверка принадлежности адреса хотя бы одной из сетей"""
+    address = ipaddress.ip_address(ip)
+    return any(address.version == network.version and address in network for network in networks)
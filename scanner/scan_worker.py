@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Модуль изолированного процесса сканирования для АСДУЕ
+
+NetworkScanner работает в отдельном процессе, поэтому nmap, ping и
+опрос сервисов не делят GIL с обработкой HTTP-запросов. Веб-процесс
+общается с ним через очереди: отправляет сеть, получает логи, каждый
+собранный хост (для контрольных точек) и итоговый список хостов.
+"""
+
+import multiprocessing
+import queue
+import threading
+
+
+def create_scanner(options):
+    """Создание NetworkScanner с настройками, нужными уже в конструкторе"""
+    from .fingerprint_cache import FingerprintCache
+    from .scanner import NetworkScanner
+
+    # TTL нужен до загрузки кэша с диска, иначе записи отбираются по TTL по умолчанию
+    fingerprint_cache = None
+    if options.get('os_cache_ttl'):
+        fingerprint_cache = FingerprintCache(ttl=options['os_cache_ttl'])
+    scanner = NetworkScanner(fingerprint_cache=fingerprint_cache)
+    configure_scanner(scanner, options)
+    return scanner
+
+
+def configure_scanner(scanner, options):
+    """Применение настроек приложения к экземпляру NetworkScanner"""
+    if hasattr(scanner, 'passive_discovery'):
+        scanner.discovery_mode = options.get('discovery_mode', 'active')
+        scanner.passive_discovery.pcap_file = options.get('pcap_file')
+
+    if getattr(scanner, 'service_prober', None) is not None and options.get('service_ports'):
+        scanner.service_prober.ports = options['service_ports']
+
+    if hasattr(scanner, 'pacer') and options.get('pacing_file'):
+        try:
+            scanner.pacer.load_config(options['pacing_file'])
+        except (OSError, ValueError) as e:
+            print(f"✗ Ошибка загрузки настроек темпа {options['pacing_file']}: {e}")
+
+
+def worker_main(task_queue, result_queue, options):
+    """Цикл процесса сканирования: сеть из task_queue -> сообщения в result_queue"""
+    from .scanner import ScanError
+
+    scanner = create_scanner(options)
+    scanner.set_web_log_callback(
+        lambda message, level='info': result_queue.put(('log', message, level))
+    )
+    scanner.set_host_callback(
+        lambda network, host: result_queue.put(('host', network, host))
+    )
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        network, skip = task
+        scanner.is_scanning = True
+        try:
+            hosts = scanner.scan_network(network, skip=skip)
+            stats = {
+                'pacing': scanner.pacer.stats(),
+                'delay': scanner.pacer.inter_network_delay(network),
+                'os_cache': scanner.fingerprint_cache.stats() if scanner.fingerprint_cache is not None else None
+            }
+            result_queue.put(('result', network, hosts, stats))
+        except Exception as e:
+            # Сеть просканирована не полностью (ScanError): собранные хосты передаются вместе с ошибкой
+            partial = {'hosts': e.hosts} if isinstance(e, ScanError) else None
+            result_queue.put(('error', network, str(e), partial))
+
+
+class RemotePacer:
+    """Снимок темпа опроса из процесса сканирования"""
+
+    def __init__(self):
+        self.snapshot = {}
+        self.delays = {}
+
+    def stats(self):
+        return self.snapshot
+
+    def inter_network_delay(self, network):
+        return self.delays.get(network, 1.0)
+
+
+class RemoteCacheStats:
+    """Снимок статистики кэша ОС из процесса сканирования"""
+
+    def __init__(self):
+        self.snapshot = None
+
+    def stats(self):
+        return self.snapshot
+
+
+class ScanWorkerProcess:
+    """Сканер в отдельном процессе с интерфейсом NetworkScanner"""
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.task_queue = None
+        self.result_queue = None
+        self.is_scanning = False
+        self.web_log_callback = None
+        self.host_callback = None
+        self.pacer = RemotePacer()
+        self.fingerprint_cache = RemoteCacheStats()
+        # Процесс обрабатывает одну сеть за раз
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Запуск процесса сканирования, если он не запущен"""
+        if self.process is not None and self.process.is_alive():
+            return
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.process = self.context.Process(
+            target=worker_main,
+            args=(self.task_queue, self.result_queue, self.options),
+            name='asdue-scan-worker',
+            daemon=True
+        )
+        self.process.start()
+
+    def stop(self):
+        """Остановка процесса после текущей сети"""
+        if self.process is not None and self.process.is_alive():
+            self.task_queue.put(None)
+            self.process.join(timeout=10)
+        self.process = None
+
+    def set_web_log_callback(self, callback):
+        self.web_log_callback = callback
+
+    def set_host_callback(self, callback):
+        self.host_callback = callback
+
+    def scan_network(self, network, skip=None):
+        """Сканирование сети в процессе-исполнителе с пересылкой логов и хостов"""
+        with self.lock:
+            self.start()
+            self.task_queue.put((network, list(skip or [])))
+            while True:
+                try:
+                    message = self.result_queue.get(timeout=5)
+                except queue.Empty:
+                    # Процесс мог завершиться аварийно
+                    if not self.process.is_alive():
+                        self.process = None
+                        raise RuntimeError('Процесс сканирования завершился аварийно')
+                    continue
+
+                if message[0] == 'log':
+                    if self.web_log_callback:
+                        self.web_log_callback(message[1], message[2])
+                    continue
+                if message[0] == 'host':
+                    if self.host_callback:
+                        self.host_callback(message[1], message[2])
+                    continue
+
+                _, done_network, payload, stats = message
+                if done_network != network:
+                    continue
+                if message[0] == 'error':
+                    if stats is None:
+                        raise RuntimeError(payload)
+                    from .scanner import ScanError
+                    raise ScanError(payload, stats['hosts'])
+                self.pacer.snapshot.update(stats['pacing'])
+                self.pacer.delays[network] = stats['delay']
+                self.fingerprint_cache.snapshot = stats['os_cache']
+                return payload
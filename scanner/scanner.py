@@ -3,7 +3,6 @@
 Модуль сканирования сети для АСДУЕ с улучшенным логированием
 """
 
-import nmap
 import socket
 import subprocess
 import re
@@ -11,29 +10,77 @@ import time
 from datetime import datetime
 import ipaddress
 import logging
+import os
 import sys
+from xml.etree import ElementTree
+
+from .fingerprint_cache import FingerprintCache
+from .pacing import ProbePacer
+from .passive_discovery import PassiveDiscovery
+from .service_probe import ServiceProber, merge_ports
+
+# Режимы обнаружения хостов
+DISCOVERY_ACTIVE = 'active'    # только активный опрос (nmap / ping)
+DISCOVERY_PASSIVE = 'passive'  # только пассивные источники
+DISCOVERY_HYBRID = 'hybrid'    # пассивные источники + активный опрос остальных адресов
+
+
+class ScanError(Exception):
+    """Сеть просканирована не полностью (сбой nmap, обрезанный простой обход)
+
+    hosts - хосты, которые все же удалось собрать. Сеть с такой ошибкой не
+    считается просканированной: по ней не ищутся пропавшие хосты.
+    """
+
+    def __init__(self, message, hosts=None):
+        super().__init__(message)
+        self.hosts = hosts or []
 
 class NetworkScanner:
-    def __init__(self):
-        self.nm = nmap.PortScanner()
+    def __init__(self, discovery_mode=DISCOVERY_ACTIVE, passive_discovery=None, pacer=None,
+                 fingerprint_cache=None, service_prober=None, log_file='logs/scanner.log'):
+        self._nm = None  # nmap.PortScanner создается при первом обращении
         self.results = []
         self.is_scanning = False
         self.progress = 0
         self.current_network = ""
         self.scanned_hosts = 0
         self.web_log_callback = None  # Callback для веб-логирования
+        self.host_callback = None  # Callback для каждого собранного хоста (контрольные точки)
+        self.discovery_mode = discovery_mode
+        self.passive_discovery = passive_discovery or PassiveDiscovery()
+        self.pacer = pacer or ProbePacer()  # Темп опроса по сетям и хостам
+        # Кэш ОС по MAC и набору портов (None - кэш отключен)
+        self.fingerprint_cache = fingerprint_cache if fingerprint_cache is not None else FingerprintCache()
+        # Параллельный опрос TCP-сервисов с баннерами (None - только таблица портов nmap -F)
+        self.service_prober = service_prober if service_prober is not None else ServiceProber()
         
         # Настройка логирования
+        self.log_file = log_file
         self.setup_logging()
     
+    @property
+    def nm(self):
+        """Ленивое создание nmap.PortScanner (поиск бинарника nmap небыстрый)"""
+        if self._nm is None:
+            import nmap
+            self._nm = nmap.PortScanner()
+        return self._nm
+    
     def setup_logging(self):
         """Настройка системы логирования"""
         # Создаем логгер
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
+        if self.logger.handlers:
+            # Логгер модуля общий: обработчики второго экземпляра дублировали бы строки
+            return
         
-        # Создаем обработчик для файла
-        file_handler = logging.FileHandler('logs/scanner.log', encoding='utf-8')
+        # Создаем обработчик для файла (каталог может отсутствовать, например у агента)
+        directory = os.path.dirname(self.log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
         file_handler.setLevel(logging.INFO)
         
         # Создаем обработчик для консоли
@@ -53,6 +100,18 @@ class NetworkScanner:
         """Установка callback для веб-логирования"""
         self.web_log_callback = callback
     
+    def set_host_callback(self, callback):
+        """Установка callback(network, host_info), вызываемого для каждого хоста"""
+        self.host_callback = callback
+    
+    def report_host(self, network, host_info):
+        """Передача собранного хоста в callback (запись контрольной точки)"""
+        if self.host_callback:
+            try:
+                self.host_callback(network, host_info)
+            except Exception as e:
+                self.logger.error(f"Ошибка в host callback: {e}")
+    
     def log_to_web(self, message, level='info'):
         """Логирование для веб-интерфейса"""
         if self.web_log_callback:
@@ -70,11 +129,15 @@ class NetworkScanner:
         else:
             self.logger.info(message)
     
-    def ping_host(self, ip):
-        """Проверка доступности хоста через ping"""
+    def ping_host(self, ip, network=None):
+        """Проверка доступности хоста через ping
+
+        Если указана сеть, RTT и результат передаются в регулятор темпа.
+        """
         try:
             self.log_to_web(f"Проверка доступности: {ip}", 'info')
             
+            started = time.monotonic()
             result = subprocess.run(
                 ['ping', '-c', '1', '-W', '1', ip],
                 stdout=subprocess.PIPE,
@@ -83,6 +146,13 @@ class NetworkScanner:
             )
             
             is_available = result.returncode == 0
+            if network:
+                rtt = None
+                if is_available:
+                    match = re.search(rb'time[=<]([0-9.]+) ms', result.stdout)
+                    rtt = float(match.group(1)) / 1000 if match else time.monotonic() - started
+                self.pacer.record(network, ip, rtt=rtt, success=is_available)
+            
             if is_available:
                 self.log_to_web(f"✓ Хост активен: {ip}", 'success')
             else:
@@ -172,27 +242,34 @@ class NetworkScanner:
         
         return "Unknown"
     
-    def scan_network_nmap(self, network):
-        """Сканирование сети с помощью nmap"""
+    def scan_network_nmap(self, network, exclude=None):
+        """Сканирование сети с помощью nmap (exclude - уже известные адреса)"""
         self.log_to_web(f"Начинаем сканирование сети: {network} (метод: nmap)", 'info')
         print(f"[NMAP] Сканируем сеть: {network}")
         
         try:
+            pacing_args = self.pacer.nmap_args(network)
+            arguments = f'-sn {pacing_args}'
+            if exclude:
+                arguments += ' --exclude ' + ','.join(sorted(exclude))
+            
             # Логируем параметры сканирования
-            self.log_to_web(f"Используем аргументы nmap: -sn -T4", 'info')
+            self.log_to_web(f"Используем аргументы nmap: -sn {pacing_args}"
+                            f"{f' (исключено известных адресов: {len(exclude)})' if exclude else ''}", 'info')
             
             # Быстрое сканирование хостов
-            self.nm.scan(hosts=network, arguments='-sn -T4')
+            self.nm.scan(hosts=network, arguments=arguments)
             
             hosts = []
+            up_hosts = []
             all_hosts = self.nm.all_hosts()
             self.log_to_web(f"Найдено {len(all_hosts)} хостов для проверки в сети {network}", 'info')
             
+            # Сначала собираем активные хосты: детальное сканирование перезаписывает результаты self.nm
             for i, host in enumerate(all_hosts):
                 if self.nm[host].state() == 'up':
                     self.log_to_web(f"Хост {host} активен (статус: up)", 'success')
-                    host_info = self.get_host_details(host)
-                    hosts.append(host_info)
+                    up_hosts.append(host)
                 else:
                     self.log_to_web(f"Хост {host} не активен (статус: {self.nm[host].state()})", 'info')
                 
@@ -200,6 +277,15 @@ class NetworkScanner:
                 if (i + 1) % 10 == 0:
                     self.log_to_web(f"Прогресс: проверено {i + 1}/{len(all_hosts)} хостов", 'info')
             
+            self.record_discovery_pace(network, up_hosts)
+            
+            closed = {}
+            services = self.probe_services(up_hosts, closed)
+            for host in up_hosts:
+                host_info = self.get_host_details(host, ports=services.get(host), closed_ports=closed.get(host))
+                hosts.append(host_info)
+                self.report_host(network, host_info)
+            
             self.log_to_web(f"Сеть {network}: найдено {len(hosts)} активных устройств", 'success')
             return hosts
             
@@ -207,10 +293,53 @@ class NetworkScanner:
             error_msg = f"Ошибка nmap для сети {network}: {e}"
             self.log_to_web(error_msg, 'error')
             print(error_msg)
-            return []
+            raise ScanError(error_msg) from e
     
-    def get_host_details(self, ip):
-        """Получение детальной информации о хосте"""
+    def record_discovery_pace(self, network, up_hosts):
+        """Передача результатов nmap -sn в регулятор темпа
+
+        RTT берется из srtt хостов в XML-выводе nmap. Хосты, не ответившие
+        на обнаружение (выключенные, свободные адреса), потерей не считаются.
+        """
+        rtts = self.nmap_host_rtts()
+        for host in up_hosts:
+            self.pacer.record(network, host, rtt=rtts.get(host), success=True)
+    
+    def nmap_host_rtts(self):
+        """RTT хостов последнего запуска nmap: {ip: секунды} из <times srtt> (микросекунды)"""
+        output = self.nm.get_nmap_last_output()
+        if not output:
+            return {}
+        try:
+            root = ElementTree.fromstring(output)
+        except ElementTree.ParseError:
+            return {}
+        
+        rtts = {}
+        for host in root.iter('host'):
+            times = host.find('times')
+            if times is None:
+                continue
+            try:
+                srtt = int(times.get('srtt', '-1'))
+            except ValueError:
+                continue
+            if srtt <= 0:
+                continue
+            for address in host.findall('address'):
+                if address.get('addrtype') in ('ipv4', 'ipv6'):
+                    rtts[address.get('addr')] = srtt / 1000000
+        return rtts
+    
+    def get_host_details(self, ip, mac=None, hostname=None, ports=None, closed_ports=None):
+        """Получение детальной информации о хосте
+
+        mac и hostname могут быть переданы из пассивных источников,
+        тогда соответствующие запросы (ARP / DNS) не выполняются.
+        ports и closed_ports - открытые и закрытые порты из опроса сервисов:
+        если они переданы, nmap -F не запускается, а nmap -O запускается
+        только при промахе кэша ОС.
+        """
         self.log_to_web(f"Сбор детальной информации о хосте {ip}...", 'info')
         
         host_info = {
@@ -226,40 +355,67 @@ class NetworkScanner:
         
         try:
             # Получаем имя хоста
-            hostname = self.get_hostname(ip)
+            if not hostname:
+                hostname = self.get_hostname(ip)
             if hostname:
                 host_info['hostname'] = hostname
             
             # Получаем MAC и производителя
-            mac, vendor = self.get_mac_vendor(ip)
+            if mac:
+                vendor = self.get_vendor_by_mac(mac)
+            else:
+                mac, vendor = self.get_mac_vendor(ip)
             host_info['mac'] = mac
             host_info['vendor'] = vendor
             
-            # Быстрое сканирование портов и ОС
+            # Порты (из опроса сервисов или nmap -F) и ОС (кэш или nmap -O)
             try:
                 self.log_to_web(f"Детальное сканирование хоста {ip} (порты и ОС)...", 'info')
-                self.nm.scan(hosts=ip, arguments='-O -F')
                 
-                if ip in self.nm.all_hosts():
-                    # Определение ОС
-                    if 'osmatch' in self.nm[ip]:
-                        if self.nm[ip]['osmatch']:
-                            os_info = self.nm[ip]['osmatch'][0]
-                            host_info['os'] = f"{os_info['name']} (accuracy: {os_info['accuracy']}%)"
-                            self.log_to_web(f"ОС хоста {ip}: {host_info['os']}", 'info')
+                def nmap_scan(arguments):
+                    if self.current_network:
+                        self.pacer.acquire(self.current_network, ip)
+                        arguments += ' ' + self.pacer.nmap_args(self.current_network)
+                    return self.nmap_host_scan(ip, arguments)
+                
+                use_cache = self.fingerprint_cache is not None and mac != 'Unknown'
+                if ports is None and not use_cache:
+                    # Без опроса сервисов и кэша порты и ОС определяются одним запуском nmap
+                    os_name, nmap_ports = nmap_scan('-O -F')
+                    host_info['ports'] = nmap_ports
+                    if os_name:
+                        host_info['os'] = os_name
+                        self.log_to_web(f"ОС хоста {ip}: {host_info['os']}", 'info')
+                else:
+                    if ports is not None:
+                        # Порты уже известны из опроса сервисов: nmap -F не запускается
+                        host_info['ports'] = ports
+                        closed = list(closed_ports or [])
+                    else:
+                        # Сначала только порты: по MAC и набору портов ищем ОС в кэше
+                        _, nmap_ports = nmap_scan('-F')
+                        host_info['ports'] = nmap_ports
+                        closed = [p['port'] for p in nmap_ports if p['state'] == 'closed']
+                    open_ports = [p['port'] for p in host_info['ports'] if p['state'] == 'open']
                     
-                    # Открытые порты
-                    if 'tcp' in self.nm[ip]:
-                        port_count = len(self.nm[ip]['tcp'])
-                        self.log_to_web(f"Найдено {port_count} открытых портов у {ip}", 'info')
-                        
-                        for port in self.nm[ip]['tcp']:
-                            port_info = self.nm[ip]['tcp'][port]
-                            host_info['ports'].append({
-                                'port': port,
-                                'state': port_info['state'],
-                                'service': port_info['name']
-                            })
+                    cached_os = self.fingerprint_cache.get(mac, open_ports) if use_cache else None
+                    if cached_os:
+                        host_info['os'] = cached_os
+                        self.log_to_web(f"ОС хоста {ip} из кэша: {cached_os} (nmap -O пропущен)", 'info')
+                    else:
+                        os_name, nmap_ports = nmap_scan(self.os_scan_args(open_ports, closed))
+                        # Закрытые порты из -O -p не добавляются: таблица как при попадании в кэш
+                        host_info['ports'] = merge_ports(host_info['ports'],
+                                                         [p for p in nmap_ports if p['state'] == 'open'])
+                        if os_name:
+                            host_info['os'] = os_name
+                            self.log_to_web(f"ОС хоста {ip}: {host_info['os']}", 'info')
+                        if use_cache:
+                            # Ключ строится по тому же набору портов, что и при поиске
+                            self.fingerprint_cache.put(mac, open_ports, host_info['os'])
+                
+                if host_info['ports']:
+                    self.log_to_web(f"Найдено {len(host_info['ports'])} открытых портов у {ip}", 'info')
             
             except Exception as e:
                 self.log_to_web(f"Детальное сканирование {ip} не удалось: {e}", 'warning')
@@ -270,12 +426,103 @@ class NetworkScanner:
         self.log_to_web(f"Информация о хосте {ip} собрана", 'success')
         return host_info
     
-    def scan_network_simple(self, network_cidr):
+    def os_scan_args(self, open_ports, closed_ports):
+        """Аргументы nmap -O по уже известным портам
+
+        Для надежного определения ОС nmap нужен хотя бы один открытый и один
+        закрытый порт. Если оба известны, -O идет только по ним, иначе
+        nmap сам ищет их среди портов -F.
+        """
+        if open_ports and closed_ports:
+            ports = sorted(set(open_ports)) + [min(closed_ports)]
+            return '-O -p ' + ','.join(str(p) for p in ports)
+        return '-O -F'
+    
+    def nmap_host_scan(self, ip, arguments):
+        """Сканирование одного хоста nmap, возвращает (ОС или None, список портов)"""
+        self.nm.scan(hosts=ip, arguments=arguments)
+        
+        os_name = None
+        ports = []
+        if ip in self.nm.all_hosts():
+            # Определение ОС
+            if self.nm[ip].get('osmatch'):
+                os_info = self.nm[ip]['osmatch'][0]
+                os_name = f"{os_info['name']} (accuracy: {os_info['accuracy']}%)"
+            
+            # Открытые порты
+            if 'tcp' in self.nm[ip]:
+                for port in self.nm[ip]['tcp']:
+                    port_info = self.nm[ip]['tcp'][port]
+                    ports.append({
+                        'port': port,
+                        'state': port_info['state'],
+                        'service': port_info['name']
+                    })
+        return os_name, ports
+    
+    def probe_services(self, ips, closed=None):
+        """Параллельный опрос TCP-сервисов всех хостов: {ip: порты} или {} если опрос отключен
+
+        closed - словарь, в который пишутся закрытые порты хостов (для nmap -O).
+        """
+        if self.service_prober is None or not ips:
+            return {}
+        
+        self.log_to_web(f"Опрос сервисов: {len(ips)} хостов x {len(self.service_prober.ports)} портов", 'info')
+        start_time = time.time()
+        try:
+            services = self.service_prober.probe_hosts(ips, pacer=self.pacer, network=self.current_network or None,
+                                                       closed=closed)
+        except Exception as e:
+            self.log_to_web(f"Ошибка опроса сервисов: {e}", 'warning')
+            return {}
+        
+        open_count = sum(len(ports) for ports in services.values())
+        self.log_to_web(f"Опрос сервисов завершен за {time.time() - start_time:.1f} секунд: "
+                        f"открытых портов {open_count}", 'info')
+        return services
+    
+    def scan_network_passive(self, network_cidr, skip=None):
+        """Пассивное обнаружение: хосты из таблицы соседей, аренд DHCP и pcap
+
+        skip - адреса, уже собранные ранее (продолжение с контрольной точки).
+        """
+        self.log_to_web(f"Пассивное обнаружение хостов в сети: {network_cidr}", 'info')
+        print(f"[PASSIVE] Сеть: {network_cidr}")
+        
+        hosts = []
+        try:
+            known = self.passive_discovery.hosts_in_network(network_cidr)
+        except Exception as e:
+            error_msg = f"Ошибка пассивного обнаружения для {network_cidr}: {e}"
+            self.log_to_web(error_msg, 'warning')
+            raise ScanError(error_msg) from e
+        
+        self.log_to_web(f"Пассивные источники: {len(known)} хостов в сети {network_cidr}", 'info')
+        
+        ordered = sorted(
+            ((ip, info) for ip, info in known.items() if not skip or ip not in skip),
+            key=lambda item: ipaddress.ip_address(item[0])
+        )
+        closed = {}
+        services = self.probe_services([ip for ip, _ in ordered], closed)
+        for ip, info in ordered:
+            host_info = self.get_host_details(ip, mac=info['mac'], hostname=info['hostname'],
+                                              ports=services.get(ip), closed_ports=closed.get(ip))
+            host_info['discovery'] = ','.join(info['sources'])
+            hosts.append(host_info)
+            self.report_host(network_cidr, host_info)
+        
+        return hosts
+    
+    def scan_network_simple(self, network_cidr, exclude=None):
         """Простое сканирование сети (без nmap, если он не работает)"""
         self.log_to_web(f"Начинаем простое сканирование сети: {network_cidr}", 'info')
         print(f"[SIMPLE] Сканируем сеть: {network_cidr}")
         
         hosts = []
+        error_msg = None
         
         try:
             # Парсим CIDR
@@ -292,16 +539,21 @@ class NetworkScanner:
             
             for ip in network.hosts():
                 if count >= max_hosts:
+                    error_msg = (f"Простое сканирование {network_cidr} обрезано: "
+                                 f"проверено {count} из {total_hosts} адресов")
                     break
                 
                 ip_str = str(ip)
+                if exclude and ip_str in exclude:
+                    continue
                 count += 1
                 
                 # Логируем прогресс каждые 5 адресов
                 if count % 5 == 0:
                     self.log_to_web(f"Прогресс: проверено {count}/{max_hosts} адресов, найдено {found_hosts} хостов", 'info')
                 
-                if self.ping_host(ip_str):
+                self.pacer.acquire(network_cidr, ip_str)
+                if self.ping_host(ip_str, network=network_cidr):
                     host_info = {
                         'ip': ip_str,
                         'hostname': self.get_hostname(ip_str),
@@ -320,24 +572,74 @@ class NetworkScanner:
                     hosts.append(host_info)
                     found_hosts += 1
                     self.log_to_web(f"Найден хост: {ip_str} (всего найдено: {found_hosts})", 'success')
-                
-                time.sleep(0.05)  # Уменьшили паузу для ускорения
         
         except Exception as e:
             error_msg = f"Ошибка простого сканирования {network_cidr}: {e}"
             self.log_to_web(error_msg, 'error')
             print(error_msg)
         
+        services = self.probe_services([host['ip'] for host in hosts])
+        for host in hosts:
+            host['ports'] = services.get(host['ip'], [])
+            self.report_host(network_cidr, host)
+        
+        if error_msg:
+            # Найденные хосты сохраняются, но сеть не считается просканированной
+            raise ScanError(error_msg, hosts)
+        
         self.log_to_web(f"Простое сканирование {network_cidr} завершено: найдено {len(hosts)} устройств", 'success')
         return hosts
     
-    def scan_network(self, network_cidr):
-        """Основной метод сканирования сети"""
+    def scan_network(self, network_cidr, skip=None):
+        """Основной метод сканирования сети
+
+        skip - адреса хостов, уже собранных до сбоя (из контрольной точки):
+        они не опрашиваются повторно и не входят в возвращаемый список.
+        """
         self.log_to_web(f"Начинаем сканирование сети: {network_cidr}", 'info')
         start_time = time.time()
+        self.current_network = network_cidr
+        skip = set(skip or [])
+        if skip:
+            self.log_to_web(f"Пропускаем уже собранные хосты сети {network_cidr}: {len(skip)}", 'info')
         
         try:
-            results = self.scan_network_nmap(network_cidr)
+            return self._scan_network(network_cidr, start_time, skip)
+        finally:
+            self.pacer.release_hosts(network_cidr)
+            if self.fingerprint_cache is not None:
+                try:
+                    self.fingerprint_cache.save()
+                except OSError as e:
+                    self.log_to_web(f"Не удалось сохранить кэш ОС: {e}", 'warning')
+            self.current_network = ""
+    
+    def _scan_network(self, network_cidr, start_time, skip):
+        """Обнаружение хостов сети выбранным методом
+
+        Если сеть не удалось просканировать полностью, выбрасывается ScanError
+        с уже собранными хостами.
+        """
+        passive_results = []
+        if self.discovery_mode in (DISCOVERY_PASSIVE, DISCOVERY_HYBRID):
+            try:
+                passive_results = self.scan_network_passive(network_cidr, skip=skip)
+            except ScanError:
+                if self.discovery_mode == DISCOVERY_PASSIVE:
+                    raise
+                # В гибридном режиме адреса опрашиваются активно
+                passive_results = []
+            if self.discovery_mode == DISCOVERY_PASSIVE:
+                scan_duration = time.time() - start_time
+                self.log_to_web(f"Пассивное обнаружение {network_cidr} завершено за {scan_duration:.1f} секунд: "
+                                f"найдено {len(passive_results)} устройств", 'success')
+                return passive_results
+        
+        # Активно опрашиваем только адреса, не найденные пассивно и не собранные ранее
+        exclude = {host['ip'] for host in passive_results} | skip
+        
+        try:
+            results = passive_results + self.scan_network_nmap(network_cidr, exclude=exclude)
             end_time = time.time()
             scan_duration = end_time - start_time
             
@@ -353,10 +655,13 @@ class NetworkScanner:
             print(error_msg)
             
             self.log_to_web(f"Используем простой метод сканирования для сети {network_cidr}", 'info')
-            results = self.scan_network_simple(network_cidr)
+            try:
+                results = passive_results + self.scan_network_simple(network_cidr, exclude=exclude)
+            except ScanError as e:
+                raise ScanError(str(e), passive_results + e.hosts) from e
             
             end_time = time.time()
             scan_duration = end_time - start_time
             self.log_to_web(f"Сканирование {network_cidr} завершено за {scan_duration:.1f} секунд", 'success')
             
-            return results
\ No newline at end of file
+            return results
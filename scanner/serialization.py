@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Модуль сериализации JSON для АСДУЕ
+
+Использует orjson, если он установлен, иначе стандартный json.
+Закодированные ответы кэшируются по версии состояния: повторный запрос
+при неизменном состоянии не кодирует данные заново. Ответ может
+собираться из отдельно закодированных частей (extend), чтобы изменение
+одной части не вызывало повторного кодирования остальных.
+"""
+
+import hashlib
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Кодирование в JSON (bytes, UTF-8), неизвестные типы через str()"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class EncodedCache:
+    """Кэш закодированных ответов: имя -> (версия, тело, ETag)"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, name, version, build):
+        """Тело и ETag для версии состояния; build() вызывается только при ее смене"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+        body = dumps(build())
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            self.entries[name] = (version, body, etag)
+        return body, etag
+
+    def extend(self, name, base, fields):
+        """JSON-объект из закодированного словаря base и закодированных полей.
+
+        base (или None - пустой объект) и значения fields [(ключ, часть)] -
+        пары (тело, ETag) из get(). Результат кэшируется по ETag частей, его
+        ETag вычисляется из них же, без хэширования всего тела.
+        """
+        parts = ([base] if base is not None else []) + [part for _, part in fields]
+        version = tuple(etag for _, etag in parts)
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+        members = [dumps(key) + b':' + body for key, (body, _) in fields]
+        if base is not None and base[0] != b'{}':
+            members.insert(0, base[0][1:-1])
+        body = b'{' + b','.join(members) + b'}'
+        etag = hashlib.sha1('|'.join(version).encode('ascii')).hexdigest()
+        with self.lock:
+            self.entries[name] = (version, body, etag)
+        return body, etag
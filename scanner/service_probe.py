@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Модуль опроса TCP-сервисов для АСДУЕ
+
+Параллельные TCP-подключения к списку портов сразу по многим хостам,
+получение баннеров и классификация сервисов (SSH, HTTP, FTP, SMTP,
+Telnet, Modbus/TCP, S7comm и др.). Для Modbus и S7 отправляются только
+безопасные запросы чтения / установления соединения.
+
+Если передан регулятор темпа, каждое подключение ждет токена сети и
+хоста, число одновременных подключений ограничено пределами сети
+(max_rate, host_rate), а RTT подключений и неответы хостов передаются
+регулятору.
+"""
+
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PORTS = [
+    21, 22, 23, 25, 53, 80, 102, 110, 135, 139, 143, 443, 445, 502,
+    1433, 1883, 2404, 3306, 3389, 4840, 5432, 5900, 8080, 8443, 20000, 44818,
+]
+
+# Известные порты, для которых имя сервиса определяется без баннера
+PORT_SERVICES = {
+    102: 's7comm',
+    443: 'https',
+    502: 'modbus',
+    1883: 'mqtt',
+    2404: 'iec-104',
+    4840: 'opc-ua',
+    8443: 'https-alt',
+    20000: 'dnp3',
+    44818: 'ethernet-ip',
+}
+
+HTTP_PORTS = {80, 8000, 8008, 8080, 8081, 8888}
+
+# Modbus/TCP: чтение одного holding-регистра (функция 0x03) с unit id 1
+MODBUS_PROBE = b'\x00\x01\x00\x00\x00\x06\x01\x03\x00\x00\x00\x01'
+# ISO-TSAP (TPKT + COTP Connection Request), с которого начинается S7comm
+S7_COTP_PROBE = bytes.fromhex('0300001611e00000000100c0010ac1020100c2020102')
+
+HTTP_PROBE = b'HEAD / HTTP/1.0\r\n\r\n'
+
+MAX_BANNER = 512
+
+
+def probe_payload(port):
+    """Данные для отправки, если сервис молчит после подключения"""
+    if port in HTTP_PORTS:
+        return HTTP_PROBE
+    if port == 502:
+        return MODBUS_PROBE
+    if port == 102:
+        return S7_COTP_PROBE
+    return None
+
+
+def classify(port, banner):
+    """Классификация сервиса по баннеру: (service, product)"""
+    if banner.startswith(b'SSH-'):
+        return 'ssh', banner.split(b'\r', 1)[0].split(b'\n', 1)[0].decode('ascii', 'replace')
+    if banner.startswith(b'HTTP/'):
+        match = re.search(rb'^Server:\s*(.+?)\r?$', banner, re.M | re.I)
+        return 'http', match.group(1).decode('latin-1') if match else ''
+    if port == 502 and len(banner) >= 8 and banner[:2] == MODBUS_PROBE[:2] and banner[2:4] == b'\x00\x00':
+        # Ответ с кодом исключения тоже подтверждает Modbus/TCP
+        return 'modbus', 'Modbus/TCP'
+    if port == 102 and len(banner) >= 6 and banner[0] == 0x03 and banner[5] == 0xD0:
+        return 's7comm', 'ISO-TSAP (S7comm)'
+    if banner[:1] == b'\xff':
+        return 'telnet', ''
+    if banner.startswith(b'220'):
+        text = banner.decode('latin-1', 'replace')
+        first_line = text.splitlines()[0] if text else ''
+        if 'FTP' in text.upper():
+            return 'ftp', first_line[4:]
+        if 'SMTP' in text.upper() or 'MAIL' in text.upper():
+            return 'smtp', first_line[4:]
+        return 'ftp' if port == 21 else 'smtp', first_line[4:]
+    if banner.startswith((b'+OK', b'* OK')):
+        return 'pop3' if banner.startswith(b'+OK') else 'imap', banner.decode('latin-1', 'replace').strip()
+    if b'mysql' in banner.lower() or (port == 3306 and banner):
+        return 'mysql', ''
+    if banner.startswith(b'RFB '):
+        return 'vnc', banner.decode('ascii', 'replace').strip()
+    return default_service(port), ''
+
+
+def default_service(port):
+    """Имя сервиса по номеру порта"""
+    if port in PORT_SERVICES:
+        return PORT_SERVICES[port]
+    try:
+        return socket.getservbyport(port, 'tcp')
+    except OSError:
+        return 'unknown'
+
+
+def merge_ports(probed, nmap_ports):
+    """Объединение портов опроса и nmap по номеру порта (данные опроса точнее)"""
+    merged = {}
+    for port_info in nmap_ports or []:
+        merged[port_info['port']] = port_info
+    for port_info in probed or []:
+        merged[port_info['port']] = port_info
+    return [merged[port] for port in sorted(merged)]
+
+
+class ServiceProber:
+    """Параллельный опрос TCP-портов с получением баннеров"""
+
+    def __init__(self, ports=None, connect_timeout=1.0, banner_timeout=1.5, max_workers=256):
+        self.ports = list(ports or DEFAULT_PORTS)
+        self.connect_timeout = connect_timeout
+        self.banner_timeout = banner_timeout
+        self.max_workers = max_workers
+
+    def probe_port(self, ip, port, observe=None):
+        """Опрос одного порта: словарь сервиса, {'port', 'state': 'closed'}
+        при отказе в подключении или None, если хост не ответил
+
+        observe(ip, rtt, responded) получает результат подключения: отказ
+        (RST) - тоже ответ хоста, таймаут и недоступность - нет.
+        """
+        started = time.monotonic()
+        try:
+            sock = socket.create_connection((ip, port), timeout=self.connect_timeout)
+        except ConnectionRefusedError:
+            if observe:
+                observe(ip, time.monotonic() - started, True)
+            return {'port': port, 'state': 'closed'}
+        except OSError:
+            if observe:
+                observe(ip, None, False)
+            return None
+        if observe:
+            observe(ip, time.monotonic() - started, True)
+
+        banner = b''
+        try:
+            sock.settimeout(self.banner_timeout)
+            payload = probe_payload(port)
+            if payload is None:
+                try:
+                    banner = sock.recv(MAX_BANNER)
+                except socket.timeout:
+                    # Сервис ждет запроса клиента - пробуем HTTP
+                    sock.sendall(HTTP_PROBE)
+                    banner = sock.recv(MAX_BANNER)
+            else:
+                sock.sendall(payload)
+                banner = sock.recv(MAX_BANNER)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+        service, product = classify(port, banner)
+        return {
+            'port': port,
+            'state': 'open',
+            'service': service,
+            'product': product,
+            'banner': banner[:128].decode('latin-1', 'replace').strip() if banner else ''
+        }
+
+    def probe_hosts(self, ips, ports=None, pacer=None, network=None, closed=None):
+        """Опрос портов всех хостов одновременно: {ip: [сервисы по возрастанию порта]}
+
+        pacer и network - регулятор темпа и сеть, пределы которой соблюдаются.
+        Если передан словарь closed, в него пишутся закрытые порты (отказ в
+        подключении) по хостам: они нужны nmap -O.
+        """
+        ports = sorted(set(ports or self.ports))
+        results = {ip: [] for ip in ips}
+        # Порты снаружи: соседние задачи относятся к разным хостам
+        tasks = [(ip, port) for port in ports for ip in ips]
+        if not tasks:
+            return results
+
+        workers = min(self.max_workers, len(tasks))
+        probe = lambda task: self.probe_port(*task)
+        if pacer is not None and network:
+            limits = pacer.limits_for(network)
+            workers = min(workers, max(1, int(limits['max_rate'])))
+            host_slots = {ip: threading.Semaphore(max(1, int(limits['host_rate']))) for ip in ips}
+            responded = set()
+            silent = set()
+            lock = threading.Lock()
+
+            def observe(ip, rtt, success):
+                # Таймаут хоста, уже ответившего на другой порт, - фильтр порта,
+                # а не потеря; неответивший хост считается потерей один раз
+                with lock:
+                    if success:
+                        responded.add(ip)
+                    elif ip in responded or ip in silent:
+                        return
+                    else:
+                        silent.add(ip)
+                pacer.record(network, ip, rtt=rtt, success=success)
+
+            def probe(task):
+                ip, port = task
+                with host_slots[ip]:
+                    pacer.acquire(network, ip)
+                    return self.probe_port(ip, port, observe)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (ip, _), service in zip(tasks, executor.map(probe, tasks)):
+                if service is None:
+                    continue
+                if service['state'] == 'open':
+                    results[ip].append(service)
+                elif closed is not None:
+                    closed.setdefault(ip, []).append(service['port'])
+        return results
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Тесты сравнения инвентаря и журнала событий изменений
+
+Запуск: python -m pytest tests  (или python -m unittest discover tests)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.change_detector import ChangeDetector, host_port_set
+
+NETWORK = '10.0.0.0/24'
+
+
+def host(ip, mac='AA:BB:CC:00:00:01', os_name='Linux 5.4 (accuracy: 96%)', ports=(22,)):
+    return {
+        'ip': ip,
+        'mac': mac,
+        'os': os_name,
+        'ports': [{'port': port, 'state': 'open', 'service': ''} for port in ports],
+        'scan_time': '2026-01-01 00:00:00'
+    }
+
+
+def event_types(events):
+    return sorted((e['type'], e['ip']) for e in events)
+
+
+class ChangeDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.detector = ChangeDetector(
+            inventory_file=os.path.join(self.directory, 'inventory.json'),
+            events_file=os.path.join(self.directory, 'events.jsonl'),
+            webhook_queue_file=os.path.join(self.directory, 'webhook_queue.jsonl')
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_new_changed_and_gone_hosts(self):
+        self.detector.process([host('10.0.0.1'), host('10.0.0.2')], [NETWORK])
+
+        events = self.detector.process([
+            host('10.0.0.1', mac='AA:BB:CC:00:00:09', ports=(22, 80)),
+            host('10.0.0.3'),
+        ], [NETWORK])
+
+        self.assertEqual(event_types(events), [
+            ('host_gone', '10.0.0.2'),
+            ('host_new', '10.0.0.3'),
+            ('mac_changed', '10.0.0.1'),
+            ('port_opened', '10.0.0.1'),
+        ])
+
+    def test_hosts_outside_scanned_networks_are_kept(self):
+        self.detector.process([host('10.0.0.1'), host('10.0.1.1')], [NETWORK, '10.0.1.0/24'])
+
+        events = self.detector.process([host('10.0.0.1')], [NETWORK])
+
+        self.assertEqual(events, [])
+        self.assertIn('10.0.1.1', self.detector.load_inventory())
+
+    def test_unknown_values_and_accuracy_jitter_are_not_changes(self):
+        self.detector.process([host('10.0.0.1')], [NETWORK])
+
+        events = self.detector.process([
+            host('10.0.0.1', mac='Unknown', os_name='Linux 5.4 (accuracy: 91%)')
+        ], [NETWORK])
+
+        self.assertEqual(events, [])
+        record = self.detector.load_inventory()['10.0.0.1']
+        self.assertEqual(record['mac'], 'AA:BB:CC:00:00:01')
+
+    def test_port_entries_without_number_are_ignored(self):
+        entry = host('10.0.0.1', ports=(22,))
+        entry['ports'].append({'state': 'open', 'service': 'unknown'})
+        entry['ports'].append({'port': None, 'state': 'open'})
+
+        self.assertEqual(host_port_set(entry), {22})
+        self.assertEqual(event_types(self.detector.process([entry], [NETWORK])), [('host_new', '10.0.0.1')])
+
+    def test_read_events_returns_tail(self):
+        with open(self.detector.events_file, 'w', encoding='utf-8') as f:
+            for i in range(5000):
+                f.write(json.dumps({'type': 'host_new', 'ip': f'10.0.{i // 256}.{i % 256}'}) + '\n')
+
+        last = self.detector.read_events(3)
+        self.assertEqual([e['ip'] for e in last], ['10.0.19.133', '10.0.19.134', '10.0.19.135'])
+        self.assertEqual(len(self.detector.read_events(0)), 1)
+        self.assertEqual(len(self.detector.read_events(-10)), 1)
+        self.assertEqual(len(self.detector.read_events(10000)), 5000)
+
+    def test_undelivered_webhook_events_are_requeued(self):
+        self.detector.process([host('10.0.0.1')], [NETWORK])
+
+        with self.assertRaises(OSError):
+            self.detector.deliver_webhook('http://127.0.0.1:1/hook', timeout=1)
+
+        queued = self.detector.drain_webhook_queue()
+        self.assertEqual(event_types(queued), [('host_new', '10.0.0.1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Тесты импорта списков сетей и хостов
+
+Запуск: python -m pytest tests  (или python -m unittest discover tests)
+"""
+
+import gzip
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.importer import import_stream
+
+BOM = '\ufeff'
+
+
+def run_import(text, filename, compress=False):
+    data = text.encode('utf-8')
+    if compress:
+        data = gzip.compress(data)
+    return import_stream(io.BytesIO(data), filename)
+
+
+class ImportStreamTest(unittest.TestCase):
+
+    def test_bom_is_not_part_of_first_record(self):
+        networks, _, report = run_import(BOM + '10.0.0.0/24\n', 'networks.txt')
+        self.assertEqual(networks, ['10.0.0.0/24'])
+        self.assertEqual(report['errors_count'], 0)
+
+        # Заголовок CSV с BOM распознается, первая ячейка - столбец ip
+        _, seeds, report = run_import(BOM + 'ip,name\n10.0.0.5,plc\n', 'hosts.csv.gz', compress=True)
+        self.assertEqual(seeds, ['10.0.0.5'])
+        self.assertEqual(report['errors_count'], 0)
+
+    def test_unspecified_and_huge_ranges_are_rejected(self):
+        text = '0.0.0.0/0\n10.0.0.0/8\n0.0.0.0\n::/0\n10.1.0.0/16\n10.2.0.1\n'
+        networks, seeds, report = run_import(text, 'networks.txt')
+
+        self.assertEqual(networks, ['10.1.0.0/16'])
+        self.assertEqual(seeds, ['10.2.0.1'])
+        self.assertEqual([e['line'] for e in report['errors']], [1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
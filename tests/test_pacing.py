@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Тесты регулятора темпа опроса
+
+Запуск: python -m pytest tests  (или python -m unittest discover tests)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.pacing import ProbePacer
+
+NETWORK = '10.0.0.0/24'
+
+
+def make_pacer(**limits):
+    settings = {'initial_rate': 20, 'max_rate': 200}
+    settings.update(limits)
+    return ProbePacer(network_limits={NETWORK: settings}, sleep=lambda _: None)
+
+
+class ProbePacerTest(unittest.TestCase):
+
+    def test_mixed_host_rtts_are_not_congestion(self):
+        pacer = make_pacer()
+        # Половина хостов рядом (0.4 мс), половина за маршрутизатором (4 мс)
+        for i in range(40):
+            rtt = 0.0004 if i % 2 else 0.004
+            pacer.record(NETWORK, f'10.0.0.{i % 10 + 1}', rtt=rtt, success=True)
+
+        stats = pacer.stats()[NETWORK]
+        self.assertEqual(stats['rate'], 100)
+        self.assertEqual(stats['losses'], 0)
+        self.assertEqual(pacer.nmap_args(NETWORK), '-T4 --max-rate 100')
+
+    def test_host_rtt_growth_is_congestion(self):
+        pacer = make_pacer()
+        pacer.record(NETWORK, '10.0.0.1', rtt=0.002, success=True)
+        for _ in range(20):
+            pacer.record(NETWORK, '10.0.0.1', rtt=0.05, success=True)
+
+        self.assertLess(pacer.stats()[NETWORK]['rate'], 20)
+
+    def test_hosts_switched_off_do_not_cut_rate(self):
+        pacer = make_pacer(initial_rate=120)
+        hosts = [f'10.0.0.{i}' for i in range(1, 9)]
+        for host in hosts:
+            pacer.record(NETWORK, host, rtt=0.001, success=True)
+        pacer.release_hosts(NETWORK)
+        rate = pacer.stats()[NETWORK]['rate']
+
+        # Следующий проход: все 8 хостов выключены на ночь
+        for host in hosts:
+            pacer.record(NETWORK, host, success=False)
+
+        stats = pacer.stats()[NETWORK]
+        self.assertEqual(stats['rate'], rate)
+        self.assertEqual(stats['losses'], 0)
+
+    def test_timeout_of_responding_host_is_loss(self):
+        pacer = make_pacer()
+        pacer.record(NETWORK, '10.0.0.1', rtt=0.001, success=True)
+        pacer.record(NETWORK, '10.0.0.1', success=False)
+        # Повторный неответ того же хоста - не новая потеря
+        pacer.record(NETWORK, '10.0.0.1', success=False)
+
+        stats = pacer.stats()[NETWORK]
+        self.assertEqual(stats['losses'], 1)
+        self.assertEqual(stats['rate'], 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша закодированных JSON-ответов
+
+Запуск: python -m pytest tests  (или python -m unittest discover tests)
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.serialization import EncodedCache
+
+
+class EncodedCacheTest(unittest.TestCase):
+
+    def test_part_is_encoded_only_when_its_version_changes(self):
+        cache = EncodedCache()
+        builds = []
+
+        def results():
+            builds.append('results')
+            return [{'ip': '10.0.0.1'}]
+
+        for log_seq in range(5):
+            state = cache.get('status', (True, log_seq), lambda: {'progress': 10})
+            logs = cache.get('logs', log_seq, lambda: [f'line {log_seq}'])
+            body, _ = cache.extend('response', state, [
+                ('results', cache.get('results', 1, results)),
+                ('logs', logs)
+            ])
+
+        self.assertEqual(builds, ['results'])
+        self.assertEqual(json.loads(body), {
+            'progress': 10, 'results': [{'ip': '10.0.0.1'}], 'logs': ['line 4']
+        })
+
+    def test_etag_follows_parts(self):
+        cache = EncodedCache()
+        first = cache.extend('response', None, [('logs', cache.get('logs', 1, lambda: ['a']))])
+        same = cache.extend('response', None, [('logs', cache.get('logs', 1, lambda: ['a']))])
+        changed = cache.extend('response', None, [('logs', cache.get('logs', 2, lambda: ['b']))])
+
+        self.assertEqual(json.loads(first[0]), {'logs': ['a']})
+        self.assertEqual(first[1], same[1])
+        self.assertNotEqual(first[1], changed[1])
+
+    def test_empty_base_object(self):
+        cache = EncodedCache()
+        body, _ = cache.extend('response', cache.get('base', 1, dict), [('n', cache.get('n', 1, lambda: 1))])
+        self.assertEqual(json.loads(body), {'n': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Тесты опроса TCP-сервисов на локальных слушающих сокетах
+
+Запуск: python -m pytest tests  (или python -m unittest discover tests)
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.pacing import ProbePacer
+from scanner.service_probe import MODBUS_PROBE, ServiceProber, classify, merge_ports
+
+NETWORK = '127.0.0.0/8'
+
+
+class Counter:
+    """Счетчик одновременных подключений к нескольким серверам"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.total += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+class LocalServer:
+    """Слушающий сокет на 127.0.0.1 со своим обработчиком подключений"""
+
+    def __init__(self, handler, counter=None):
+        self.handler = handler
+        self.counter = counter or Counter()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        self.counter.enter()
+        try:
+            conn.settimeout(2)
+            self.handler(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            self.counter.leave()
+
+    def close(self):
+        self.sock.close()
+
+
+def ssh_handler(conn):
+    conn.sendall(b'SSH-2.0-OpenSSH_8.9\r\n')
+
+
+def http_handler(conn):
+    if conn.recv(1024).startswith(b'HEAD'):
+        conn.sendall(b'HTTP/1.0 200 OK\r\nServer: test-httpd/1.0\r\n\r\n')
+
+
+def slow_handler(conn):
+    # Держит подключение, чтобы подключения к хосту перекрывались во времени
+    time.sleep(0.3)
+    conn.sendall(b'SSH-2.0-slow\r\n')
+
+
+def closed_port():
+    """Номер порта, на котором никто не слушает"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ServiceProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def server(self, handler, counter=None):
+        server = LocalServer(handler, counter)
+        self.servers.append(server)
+        return server
+
+    def test_banners_and_classification(self):
+        ssh = self.server(ssh_handler)
+        http = self.server(http_handler)
+        closed = closed_port()
+        prober = ServiceProber(connect_timeout=1.0, banner_timeout=0.5)
+
+        results = prober.probe_hosts(['127.0.0.1'], ports=[ssh.port, http.port, closed])
+        services = {s['port']: s for s in results['127.0.0.1']}
+
+        self.assertEqual(set(services), {ssh.port, http.port})
+        self.assertEqual(services[ssh.port]['service'], 'ssh')
+        self.assertEqual(services[ssh.port]['product'], 'SSH-2.0-OpenSSH_8.9')
+        self.assertEqual(services[http.port]['service'], 'http')
+        self.assertEqual(services[http.port]['product'], 'test-httpd/1.0')
+
+    def test_closed_ports_are_reported_separately(self):
+        ssh = self.server(ssh_handler)
+        closed = closed_port()
+        prober = ServiceProber(connect_timeout=1.0, banner_timeout=0.5)
+
+        closed_ports = {}
+        results = prober.probe_hosts(['127.0.0.1'], ports=[ssh.port, closed], closed=closed_ports)
+
+        self.assertEqual([s['port'] for s in results['127.0.0.1']], [ssh.port])
+        self.assertEqual(closed_ports, {'127.0.0.1': [closed]})
+
+    def test_modbus_response_classification(self):
+        response = MODBUS_PROBE[:4] + b'\x00\x05\x01\x03\x02\x00\x00'
+        self.assertEqual(classify(502, response), ('modbus', 'Modbus/TCP'))
+        self.assertEqual(classify(502, b''), ('modbus', ''))
+
+    def test_pacer_bounds_host_concurrency(self):
+        counter = Counter()
+        servers = [self.server(slow_handler, counter) for _ in range(6)]
+        pacer = ProbePacer(network_limits={NETWORK: {'max_rate': 100, 'initial_rate': 100, 'host_rate': 2}})
+        prober = ServiceProber(connect_timeout=1.0, banner_timeout=1.0)
+
+        results = prober.probe_hosts(['127.0.0.1'], ports=[s.port for s in servers],
+                                     pacer=pacer, network=NETWORK)
+
+        self.assertEqual(len(results['127.0.0.1']), 6)
+        self.assertEqual(counter.total, 6)
+        self.assertLessEqual(counter.max_active, 2)
+
+    def test_pacer_receives_connect_feedback(self):
+        ssh = self.server(ssh_handler)
+        closed = closed_port()
+        pacer = ProbePacer(network_limits={NETWORK: {'initial_rate': 10}})
+        prober = ServiceProber(connect_timeout=1.0, banner_timeout=0.5)
+
+        prober.probe_hosts(['127.0.0.1'], ports=[ssh.port, closed], pacer=pacer, network=NETWORK)
+
+        stats = pacer.stats()[NETWORK]
+        # Принятое подключение и отказ (RST) - оба ответы хоста с RTT
+        self.assertEqual(stats['probes'], 2)
+        self.assertEqual(stats['losses'], 0)
+        self.assertIsNotNone(stats['srtt_ms'])
+        self.assertGreater(stats['rate'], 10)
+
+    def test_merge_ports_keeps_nmap_only_ports(self):
+        probed = [{'port': 22, 'state': 'open', 'service': 'ssh', 'product': 'OpenSSH', 'banner': 'SSH-2.0'}]
+        nmap_ports = [
+            {'port': 22, 'state': 'open', 'service': 'ssh'},
+            {'port': 111, 'state': 'open', 'service': 'rpcbind'},
+        ]
+        merged = merge_ports(probed, nmap_ports)
+        self.assertEqual([p['port'] for p in merged], [22, 111])
+        self.assertEqual(merged[0]['product'], 'OpenSSH')
+        self.assertEqual(merge_ports(None, nmap_ports), nmap_ports)
+
+
+if __name__ == '__main__':
+    unittest.main()